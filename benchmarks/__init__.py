@@ -0,0 +1,3 @@
+"""
+Benchmarks for the backend endpoints and the processing hot paths, run with python -m benchmarks.run
+"""
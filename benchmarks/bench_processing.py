@@ -0,0 +1,238 @@
+"""
+Processing hot paths: frame overlay, hyperspectral cube assembly, raw frame and ENVI writes, reflectance, lidar row accumulation
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import ROOT, skipped, summarize, time_call
+
+HSLIDAR_DIR = os.path.join(ROOT, "hslidar_from_RT")
+FRAME_BANDS, FRAME_SAMPLES = 224, 1024  # Specim frame as reshaped in hspec_camera
+STITCH_BUDGET = 60.0  # seconds, larger cases are skipped when projected above it
+
+
+def synthetic_frame(width, height, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def bench_overlay(repeats=30):
+    from utils import blur_outside_rectangle, generate_osd_frame
+    from overlay import OverlayRenderer
+    renderer = OverlayRenderer()
+    x, y, w, h = 100, 100, 400, 300
+    results = {}
+    for width, height in ((640, 480), (1920, 1080)):
+        frame = synthetic_frame(width, height)
+        blurred = blur_outside_rectangle(frame, x, y, w, h)
+        size = f"{width}x{height}"
+        results[f"overlay/blur_outside_rectangle/{size}"] = time_call(
+            lambda: blur_outside_rectangle(frame, x, y, w, h), repeats)
+        results[f"overlay/generate_osd_frame/{size}"] = time_call(
+            lambda: generate_osd_frame(blurred, x, y, w, h, ""), repeats)
+        results[f"overlay/OverlayRenderer.render/{size}"] = time_call(
+            lambda: renderer.render(frame, x, y, w, h, ""), repeats)
+    return results
+
+
+class _FrameDataset:
+    """Enough of an h5py dataset for frame_stitching: [:] returns a fresh copy, .name"""
+
+    def __init__(self, data, name):
+        self._data = data
+        self.name = name
+
+    def __getitem__(self, item):
+        return np.array(self._data[item])
+
+
+class _FrameFile:
+    """In-memory stand-in for the POH.hdf5 file, every key returns the same raw frame"""
+
+    def __init__(self, frame):
+        self._frame = frame
+
+    def __contains__(self, key):
+        # the legacy one-dataset-per-frame layout
+        return False
+
+    def __getitem__(self, key):
+        return _FrameDataset(self._frame, f"/{key}")
+
+
+class _IdlePtr:
+    """frame_stitching stops the PTZ platform over UDP, not wanted in a benchmark"""
+
+    def stop(self):
+        pass
+
+
+def _import_hslidar(module):
+    if HSLIDAR_DIR not in sys.path:
+        sys.path.insert(0, HSLIDAR_DIR)
+    return __import__(module)
+
+
+def _available_memory():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def bench_frame_stitching(line_counts=(100, 1000, 10000), repeats=3):
+    try:
+        hspec_camera = _import_hslidar("hspec_camera")
+    except ImportError as error:
+        return {f"hspec/frame_stitching/{n}": skipped(f"hspec_camera import failed: {error}") for n in line_counts}
+    raw = np.random.default_rng(0).integers(0, 4096, FRAME_BANDS * FRAME_SAMPLES, dtype=np.uint16)
+    h5_file = _FrameFile(raw)
+    results = {}
+    previous = None  # (lines, seconds) of the last case that ran
+    ptr_class = hspec_camera.scanner.Ptr
+    hspec_camera.scanner.Ptr = _IdlePtr
+    try:
+        for lines in line_counts:
+            name = f"hspec/frame_stitching/{lines}"
+            cube_bytes = lines * raw.nbytes
+            memory = _available_memory()
+            if memory is not None and cube_bytes * 2 > memory:
+                results[name] = skipped(f"cube needs {cube_bytes / 2 ** 30:.1f} GiB, "
+                                        f"{memory / 2 ** 30:.1f} GiB available")
+                continue
+            if previous is not None:
+                # cube assembly is linear in lines, project from the last case
+                projected = previous[1] * lines / previous[0]
+                if projected > STITCH_BUDGET:
+                    results[name] = skipped(f"projected {projected:.0f} s > budget {STITCH_BUDGET:.0f} s")
+                    continue
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                hspec_camera.Camera.frame_stitching(h5_file, lines)
+                samples.append(time.perf_counter() - start)
+            results[name] = summarize(samples)
+            results[name]["lines_per_s"] = round(lines / float(np.median(samples)), 1)
+            previous = (lines, float(np.median(samples)))
+    finally:
+        hspec_camera.scanner.Ptr = ptr_class
+    return results
+
+
+def bench_cube_assembly(line_counts=(100, 1000, 10000), repeats=3):
+    """Lines added as capturing does while scanning, no HDF5 read back"""
+    try:
+        cube = _import_hslidar("cube")
+    except ImportError as error:
+        return {f"hspec/cube_assembly/{n}": skipped(f"cube import failed: {error}") for n in line_counts}
+    raw = np.random.default_rng(0).integers(0, 4096, FRAME_BANDS * FRAME_SAMPLES, dtype=np.uint16)
+    memory = _available_memory()
+    results = {}
+    for lines in line_counts:
+        name = f"hspec/cube_assembly/{lines}"
+        if memory is not None and lines * raw.nbytes > memory:
+            results[name] = skipped(f"cube needs {lines * raw.nbytes / 2 ** 30:.1f} GiB")
+            continue
+
+        def assemble():
+            assembler = cube.CubeAssembler(lines)
+            for _ in range(lines):
+                assembler.add_frame(raw)
+
+        results[name] = time_call(assemble, repeats, warmup=0)
+        results[name]["lines_per_s"] = round(lines / (results[name]["p50_ms"] / 1000), 1)
+    return results
+
+
+def bench_raw_write(lines=1000, compressions=(None, "lzf", "gzip")):
+    """Raw frames appended to the chunked HDF5 dataset, as capturing writes them"""
+    try:
+        raw_store = _import_hslidar("raw_store")
+    except ImportError as error:
+        return {f"hspec/raw_write/{c}": skipped(f"raw_store import failed: {error}") for c in compressions}
+    rng = np.random.default_rng(0)
+    # band-shaped signal with sensor noise, compresses like a real frame rather than like random bits
+    frame = (np.linspace(500, 3000, FRAME_BANDS)[:, None]
+             + rng.normal(0, 20, (FRAME_BANDS, FRAME_SAMPLES))).astype(np.uint16)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for compression in compressions:
+            name = f"hspec/raw_write/{compression}"
+            path = os.path.join(directory, f"{compression}.hdf5")
+            start = time.perf_counter()
+            with raw_store.RawFrameWriter(path, FRAME_BANDS, FRAME_SAMPLES, compression=compression) as writer:
+                for line in range(lines):
+                    writer.append(frame, position=line)
+            seconds = time.perf_counter() - start
+            results[name] = summarize([seconds])
+            results[name]["lines_per_s"] = round(lines / seconds, 1)
+            results[name]["mb"] = round(os.path.getsize(path) / 2 ** 20, 1)
+    return results
+
+
+def bench_envi_write(lines=1000):
+    """Frames copied into the memory-mapped ENVI image, as capturing writes them"""
+    name = f"hspec/envi_write/{lines}"
+    try:
+        envi_writer = _import_hslidar("envi_writer")
+    except ImportError as error:
+        return {name: skipped(f"envi_writer import failed: {error}")}
+    raw = np.random.default_rng(0).integers(0, 4096, FRAME_BANDS * FRAME_SAMPLES, dtype=np.uint16)
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        with envi_writer.EnviBilWriter(os.path.join(directory, "image"), lines, FRAME_BANDS, FRAME_SAMPLES) as image:
+            for _ in range(lines):
+                image.add_frame(raw)
+        seconds = time.perf_counter() - start
+    result = summarize([seconds])
+    result["lines_per_s"] = round(lines / seconds, 1)
+    return {name: result}
+
+
+def bench_reflectance(repeats=200):
+    """Per-line dark/white reflectance conversion done by the scan writer"""
+    try:
+        radiometry = _import_hslidar("radiometry")
+    except ImportError as error:
+        return {f"hspec/reflectance/{d}": skipped(f"radiometry import failed: {error}") for d in ("float32", "uint16")}
+    rng = np.random.default_rng(0)
+    dark = rng.normal(100, 5, (FRAME_BANDS, FRAME_SAMPLES))
+    white = rng.normal(3500, 50, (FRAME_BANDS, FRAME_SAMPLES))
+    raw = rng.integers(100, 3500, (FRAME_BANDS, FRAME_SAMPLES), dtype=np.uint16)
+    results = {}
+    for dtype in (np.float32, np.uint16):
+        reflectance = radiometry.Reflectance(dark, white, dtype)
+        out = np.empty(raw.shape, dtype)
+        results[f"hspec/reflectance/{np.dtype(dtype).name}"] = time_call(lambda: reflectance.apply(raw, out), repeats)
+    return results
+
+
+def bench_lidar_rows(repeats=30):
+    name = "lidar/accumulate_rows/128x2048"
+    try:
+        lidar = _import_hslidar("lidar")
+    except ImportError as error:
+        return {name: skipped(f"lidar import failed: {error}")}
+    range_img = np.random.default_rng(0).integers(0, 20000, (128, 2048), dtype=np.uint32)
+    work = range_img.copy()
+
+    def reset():
+        # accumulate_rows sums into the first row in place
+        np.copyto(work, range_img)
+
+    return {name: time_call(lambda: lidar.Lidar.accumulate_rows(work), repeats, setup=reset)}
+
+
+def run(quick=False):
+    results = {}
+    results.update(bench_overlay(10 if quick else 30))
+    results.update(bench_frame_stitching((100,) if quick else (100, 1000, 10000), 1 if quick else 3))
+    results.update(bench_cube_assembly((100,) if quick else (100, 1000, 10000), 1 if quick else 3))
+    results.update(bench_raw_write(100 if quick else 1000))
+    results.update(bench_envi_write(100 if quick else 1000))
+    results.update(bench_reflectance(50 if quick else 200))
+    results.update(bench_lidar_rows(10 if quick else 30))
+    return results
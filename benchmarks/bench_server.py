@@ -0,0 +1,61 @@
+"""
+/image_small, /image64 and /image under concurrent clients, through an in-process ASGI client
+"""
+import asyncio
+import os
+import time
+
+from benchmarks.common import ROOT, summarize
+
+ENDPOINTS = ("/image_small", "/image64", "/image")
+
+
+def _load_app():
+    os.chdir(ROOT)
+    import main
+    # the benchmark clients share one address, do not let the rate limiter measure itself
+    main.rate_limiter.limits = {name: (1e9, 1e9) for name in main.rate_limiter.limits}
+    return main
+
+
+async def _run_clients(app, path, clients, requests_per_client, before_request=None):
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+
+    async def client(index):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            for _ in range(requests_per_client):
+                if before_request is not None:
+                    before_request()
+                start = time.perf_counter()
+                response = await http.get(path)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path} returned {response.status_code}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(clients)))
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed=elapsed)
+
+
+def run(quick=False, concurrency=(1, 8, 32), requests_per_client=20, width=640, height=480):
+    from synthetic_source import PatternGenerator
+    main = _load_app()
+    frames = PatternGenerator("noise", width, height)
+    main.frame_store.publish(frames.read())
+    if quick:
+        concurrency, requests_per_client = (1, 8), 5
+    results = {}
+    for path in ENDPOINTS:
+        for clients in concurrency:
+            # cached: every request after the first hits the encoded frame cache
+            results[f"server{path}/cached/c{clients}"] = asyncio.run(
+                _run_clients(main.app, path, clients, requests_per_client))
+            # fresh: a new camera frame before every request, so every request renders
+            results[f"server{path}/fresh/c{clients}"] = asyncio.run(
+                _run_clients(main.app, path, clients, requests_per_client,
+                             lambda: main.frame_store.publish(frames.read())))
+    main.image_pool.shutdown()
+    return results
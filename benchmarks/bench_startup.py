@@ -0,0 +1,85 @@
+"""
+Backend startup: import time of main.py, and how long a fresh uvicorn process
+takes until /health/live and /health/ready answer 200 (what a restarted gunicorn
+worker costs before it is back in service)
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import ROOT, skipped, summarize
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+TIMEOUT = 60.0
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+    except OSError:
+        return None
+
+
+def time_import():
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT,
+                                     stderr=subprocess.DEVNULL, text=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def time_server():
+    """(seconds until /health/live is 200, seconds until /health/ready is 200) of a new server process"""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--log-level", "warning"],
+                               cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    live = ready = None
+    try:
+        while time.perf_counter() - start < TIMEOUT and process.poll() is None:
+            if live is None and _status(f"{base}/health/live") == 200:
+                live = time.perf_counter() - start
+            if live is not None and _status(f"{base}/health/ready") == 200:
+                ready = time.perf_counter() - start
+                break
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    if ready is None:
+        raise RuntimeError(f"Server on port {port} not ready within {TIMEOUT:.0f} s")
+    return live, ready
+
+
+def run(quick=False, repeats=5):
+    if quick:
+        repeats = 2
+    results = {"startup/import_main": summarize([time_import() for _ in range(repeats)])}
+    try:
+        import uvicorn  # noqa: F401
+    except ImportError as error:
+        results["startup/live"] = results["startup/ready"] = skipped(f"uvicorn not installed: {error}")
+        return results
+    timings = [time_server() for _ in range(repeats)]
+    results["startup/live"] = summarize([live for live, _ in timings])
+    results["startup/ready"] = summarize([ready for _, ready in timings])
+    return results
+
+
+if __name__ == "__main__":
+    os.chdir(ROOT)
+    for name, result in run().items():
+        print(name, result)
@@ -0,0 +1,104 @@
+"""
+Timing helpers and JSON result files shared by the benchmarks
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench_results")
+
+
+def summarize(samples, count=None, elapsed=None):
+    """p50/p99/mean latency in ms of samples (seconds), throughput when elapsed is given"""
+    samples = np.asarray(samples, dtype=np.float64) * 1000
+    result = {
+        "n": int(samples.size),
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p99_ms": round(float(np.percentile(samples, 99)), 4),
+        "mean_ms": round(float(samples.mean()), 4),
+        "min_ms": round(float(samples.min()), 4),
+    }
+    if elapsed:
+        result["throughput_per_s"] = round((count or samples.size) / elapsed, 2)
+    else:
+        result["throughput_per_s"] = round(1000.0 / result["mean_ms"], 2) if result["mean_ms"] else None
+    return result
+
+
+def time_call(fn, repeats=30, warmup=2, setup=None):
+    """Runs fn repeats times (setup() before every call, not timed) and summarizes"""
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def skipped(reason):
+    return {"skipped": reason}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def environment():
+    import cv2
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def write_results(results, path=None):
+    commit = git_commit()
+    document = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "argv": sys.argv[1:],
+        "environment": environment(),
+        "results": results,
+    }
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d_%H%M%S')}_{commit}.json")
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
+    return path
+
+
+def compare(old_path, new_path, metric="p50_ms"):
+    """Lines with metric for every benchmark in both files and the new/old ratio"""
+    with open(old_path) as file:
+        old = json.load(file)
+    with open(new_path) as file:
+        new = json.load(file)
+    lines = [f"{'benchmark':60} {old['commit']:>12} {new['commit']:>12}  ratio"]
+    for name, result in new["results"].items():
+        before = old["results"].get(name, {})
+        if metric in result and metric in before:
+            ratio = result[metric] / before[metric] if before[metric] else float("inf")
+            lines.append(f"{name:60} {before[metric]:12.3f} {result[metric]:12.3f}  x{ratio:.2f}")
+        else:
+            lines.append(f"{name:60} {'-':>12} {result.get(metric, '-')!s:>12}")
+    return lines
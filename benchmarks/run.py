@@ -0,0 +1,51 @@
+"""
+Runs the benchmark suite and writes the results as JSON
+
+    python -m benchmarks.run                  # everything, bench_results/<time>_<commit>.json
+    python -m benchmarks.run --quick --only processing
+    python -m benchmarks.run --only startup    # import and time to /health/ready of a new server
+    python -m benchmarks.run --compare bench_results/old.json bench_results/new.json
+"""
+import argparse
+import logging
+
+from benchmarks import bench_processing, bench_server, bench_startup
+from benchmarks.common import compare, write_results
+
+SUITES = {
+    "processing": bench_processing.run,
+    "server": bench_server.run,
+    "startup": bench_startup.run,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LIFESPECTRA benchmarks")
+    parser.add_argument("--only", choices=sorted(SUITES), action="append", help="run only this suite")
+    parser.add_argument("--quick", action="store_true", help="fewer repeats and smaller cases")
+    parser.add_argument("--output", help="result file, default bench_results/<time>_<commit>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--metric", default="p50_ms", help="metric for --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        print("\n".join(compare(*args.compare, metric=args.metric)))
+        return
+
+    # request logging of the backend would dominate the output
+    logging.disable(logging.INFO)
+    results = {}
+    for name in args.only or SUITES:
+        print(f"[INFO] Running {name} benchmarks")
+        results.update(SUITES[name](quick=args.quick))
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:60} skipped: {result['skipped']}")
+        else:
+            print(f"{name:60} p50 {result['p50_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms  "
+                  f"{result['throughput_per_s']} /s")
+    print(f"[INFO] Results written to {write_results(results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,204 @@
+"""
+Video replay camera: a video file decoded on a background thread and published
+into a FrameStore at the file's frame rate (or a multiple of it), for testing
+the backend without a camera attached
+"""
+import argparse
+import logging
+import queue
+import threading
+import time
+
 import cv2
 
-# Replace with the path to your video file
-video_path = "test_data/file_example.AVI.avi"
+from frame_store import FrameStore
+
+VIDEO_PATH = "test_data/file_example_AVI.avi"
+
+
+class VideoReplaySource:
+    """
+    Two threads: the decoder reads ahead into a queue of at most `prefetch`
+    frames, the pacer takes them off and publishes each at its presentation time
+    (frame index / fps, divided by speed) on a monotonic clock. When the pacer
+    falls a frame or more behind, stale frames are dropped instead of published late.
+
+    seek(seconds) and set_speed(speed) can be called once started. With loop the
+    file starts over at the end, otherwise the decoder waits there for a seek or
+    stop(). A file that gives no frame at all stops the source with `error` set.
+    """
+
+    def __init__(self, store, path=VIDEO_PATH, speed=1.0, loop=True, prefetch=8, fps=None):
+        self.store = store
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.prefetch = prefetch
+        self.fps = fps  # None takes the rate from the file
+        self.frame_count = 0
+        self.decoded = 0
+        self.published = 0
+        self.dropped = 0
+        self.loops = 0
+        self.decode_time = 0.0
+        self.position = 0.0  # seconds into the file of the last published frame
+        self.finished = False
+        self.error = None
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._seek = None  # frame index requested by seek()
+        self._generation = 0  # changes on every seek, frames of an older one are discarded
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)  # a decoder parked at the end waits on it
+        self._rebase = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        capture = cv2.VideoCapture(self.path)
+        if not capture.isOpened():
+            raise FileNotFoundError(f"Cannot open video {self.path}")
+        self.fps = self.fps or capture.get(cv2.CAP_PROP_FPS) or 25.0
+        self.frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._decode, args=(capture,), name="replay-decoder", daemon=True),
+                         threading.Thread(target=self._pace, name="replay-pacer", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
 
-cap = cv2.VideoCapture(video_path)
+    def seek(self, seconds):
+        """Continue from seconds into the file, the prefetched frames are discarded"""
+        if not self.running:
+            raise RuntimeError(f"Replay of {self.path} is not running")
+        with self._lock:
+            self._seek = max(0, int(round(seconds * self.fps)))
+            self._generation += 1
+            self._wake.notify_all()
+        self.finished = False
+        self._rebase.set()
 
-# Get frame size from the video capture object
-frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    def set_speed(self, speed):
+        self.speed = speed
+        self._rebase.set()
 
-# Use DirectShow for video writing (might be more reliable)
-writer = cv2.VideoWriter(0, cv2.VideoWriter_fourcc(*'XVID'),
-                         cap.get(cv2.CAP_PROP_FPS), (frame_width, frame_height))
+    def _decode(self, capture):
+        index = 0
+        try:
+            while not self._stop.is_set():
+                with self._lock:
+                    seek, self._seek = self._seek, None
+                    generation = self._generation
+                if seek is not None:
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, seek)
+                    index = seek
+                start = time.perf_counter()
+                ret, frame = capture.read()
+                self.decode_time += time.perf_counter() - start
+                if not ret:
+                    if index == 0:
+                        # nothing to read even from the start, rewinding would only spin
+                        self.error = f"No frames in {self.path}"
+                        logging.error(f"Replay stopped: {self.error}")
+                        self._put((generation, None, None))
+                        return
+                    if not self.loop:
+                        self._put((generation, None, None))
+                        with self._lock:
+                            while self._seek is None and not self._stop.is_set():
+                                self._wake.wait()
+                        continue
+                    self.loops += 1
+                    with self._lock:
+                        if self._seek is None:
+                            self._seek = 0
+                    continue
+                self.decoded += 1
+                self._put((generation, index, frame))
+                index += 1
+        finally:
+            capture.release()
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("Error: Unable to capture frame")
-        break
+    def _put(self, item):
+        # blocks while the queue is full, that is the prefetch bound
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
 
-    writer.write(frame)
+    def _pace(self):
+        base_time = base_index = None  # monotonic time at which frame base_index is due
+        while not self._stop.is_set():
+            try:
+                generation, index, frame = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if generation != self._generation:
+                continue
+            if frame is None:
+                self.finished = True
+                base_time = None
+                continue
+            # a seek, a speed change or the start of the next loop starts a new timeline
+            if base_time is None or self._rebase.is_set() or index < base_index:
+                self._rebase.clear()
+                base_time, base_index = time.monotonic(), index
+            period = 1.0 / (self.fps * self.speed)
+            due = base_time + (index - base_index) * period
+            delay = due - time.monotonic()
+            if delay < -period:
+                self.dropped += 1
+                continue
+            if delay > 0 and self._stop.wait(delay):
+                return
+            self.store.publish(frame)
+            self.published += 1
+            self.position = index / self.fps
 
-    # Process the frame here (e.g., display)
-    # cv2.imshow('Camera', frame)  # Optional for debugging
+    def stats(self):
+        return {
+            "path": self.path,
+            "fps": self.fps,
+            "speed": self.speed,
+            "position": round(self.position, 3),
+            "frame_count": self.frame_count,
+            "decoded": self.decoded,
+            "published": self.published,
+            "dropped": self.dropped,
+            "loops": self.loops,
+            "prefetched": self._queue.qsize(),
+            "finished": self.finished,
+            "error": self.error,
+            "avg_decode_ms": round(self.decode_time / max(self.decoded, 1) * 1000, 3),
+        }
 
-    if cv2.waitKey(1) == ord('q'):
-        break
 
-cap.release()
-writer.release()
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a video file as a camera")
+    parser.add_argument("path", nargs="?", default=VIDEO_PATH)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--no-loop", action="store_true")
+    parser.add_argument("--snapshot", default=None,
+                        help="also write every frame there, e.g. app/static/image.jpg for a backend in another process")
+    args = parser.parse_args()
+    source = VideoReplaySource(FrameStore(snapshot_path=args.snapshot), args.path, args.speed,
+                               loop=not args.no_loop).start()
+    end = time.monotonic() + args.seconds
+    while time.monotonic() < end and not source.finished:
+        time.sleep(1)
+        print(source.stats())
+    source.stop()
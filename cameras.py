@@ -0,0 +1,223 @@
+"""
+Camera registry: every camera has its own frame store, encoded frame cache,
+movement queue, rate limiter and worker, so several rigs run side by side on one backend
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from clip_buffer import FrameRing
+from frame_cache import EncodedFrameCache
+from frame_store import FrameStore
+from movement import MovementQueue
+from rate_limit import RateLimiter
+from rgb_camera import CaptureStats, capture_and_save_photos
+from streaming import SharedFrameEncoder
+from utils import CameraController
+
+KINDS = ("emulator", "rgb", "synthetic", "replay", "file")
+RGB_INTERVAL = 0.5  # seconds between published frames of an rgb camera, as in rgb_camera.py
+RING_SECONDS = float(os.environ.get("LIFESPECTRA_RING_SECONDS", 10))  # pre-trigger window of rgb cameras
+RING_MAX_BYTES = int(os.environ.get("LIFESPECTRA_RING_MB", 64)) * 1024 * 1024
+CAMERA_PREFIX = "/cameras/"
+
+
+class Camera:
+    """
+    One camera and everything that serves it.
+
+    kind is one of KINDS:
+      emulator  - CameraController over the scene, option is the scene path
+      rgb       - cv2 capture device (option is its index) on a thread of its own, keeps
+                  the last RING_SECONDS at full rate in `ring` for clip export
+      synthetic - SyntheticFrameSource, option is a spec like "bars:640x480@10"
+      replay    - VideoReplaySource looping a video file, option is "path", "path@speed" or "@speed"
+      file      - the JPEG written by a separate process (rgb_camera.py), option is its path
+
+    Movement batches run on the camera's own single thread, one slow rig does
+    not hold up the moves of another. Only an emulator moves on its own, a camera
+    on a real rig moves through `hardware_move` (e.g. utils.real_cam_move_by), the
+    others cannot move at all.
+    """
+
+    def __init__(self, camera_id, kind="emulator", option=None, pool=None, limits=None, cache_size=32):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown camera kind {kind}, use one of {KINDS}")
+        self.camera_id = camera_id
+        self.kind = kind
+        self.option = option
+        self.store = FrameStore()
+        self.cache = EncodedFrameCache(max_entries=cache_size)
+        self.encoder = SharedFrameEncoder(self.cache, pool)
+        self.rate_limiter = RateLimiter(limits)
+        self.movement = MovementQueue(self._apply_movement)
+        self.image_path = option if kind == "file" else None
+        self.controller = None
+        self.hardware_move = None  # fn(camera, dx, dy) moving the rig this camera is mounted on
+        if kind == "emulator":
+            from viewport import MemmapScene
+            self.controller = CameraController(self.store, MemmapScene(option) if option else None)
+        self.source = None
+        if kind == "synthetic":
+            from synthetic_source import SyntheticFrameSource, parse_spec
+            self.source = SyntheticFrameSource(self.store, **parse_spec(option or "bars"))
+        elif kind == "replay":
+            from camera_emulate import VideoReplaySource, VIDEO_PATH
+            path, _, speed = (option or "").partition("@")
+            self.source = VideoReplaySource(self.store, path or VIDEO_PATH, float(speed or 1.0))
+        self.ring = FrameRing(RING_SECONDS, RING_MAX_BYTES) if kind == "rgb" else None
+        self.capture_stats = CaptureStats() if kind == "rgb" else None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"camera-{camera_id}")
+        self._stop = threading.Event()
+        self._capture = None
+
+    @property
+    def emulated(self):
+        return self.controller is not None
+
+    @property
+    def movable(self):
+        return self.controller is not None or self.hardware_move is not None
+
+    async def _apply_movement(self, dx, dy):
+        if self.controller is not None:
+            move, args = self.controller.move_by, (dx, dy)
+        elif self.hardware_move is not None:
+            move, args = self.hardware_move, (self, dx, dy)
+        else:
+            raise RuntimeError(f"Camera {self.camera_id} ({self.kind}) cannot move")
+        await asyncio.get_running_loop().run_in_executor(self._executor, move, *args)
+
+    async def run(self, fn, *args):
+        """Runs fn on the camera's own thread, in order with its movement batches"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def warm_up(self):
+        """
+        Opens what the camera needs and starts its worker, the slow part of startup:
+        an emulator maps its scene (decoded from the image on the first run)
+        """
+        if self.controller is not None:
+            self.controller.scene.array
+        self.start()
+
+    def start(self):
+        self._stop.clear()
+        if self._executor is None:
+            # started again after stop(), e.g. the app restarted in the same process
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"camera-{self.camera_id}")
+        if self.source is not None:
+            self.source.start()
+        elif self.kind == "rgb":
+            device = int(self.option) if self.option else 0
+            self._capture = threading.Thread(target=capture_and_save_photos,
+                                             args=(None, RGB_INTERVAL, self.store, self._stop, device, self.ring,
+                                                   self.capture_stats),
+                                             name=f"capture-{self.camera_id}", daemon=True)
+            self._capture.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.source is not None:
+            self.source.stop()
+        if self._capture is not None:
+            self._capture.join(timeout=5)
+            self._capture = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def info(self):
+        info = {"camera_id": self.camera_id, "kind": self.kind, "seq": self.store.seq,
+                "movable": self.movable, "pending_moves": self.movement.pending}
+        if self.controller is not None:
+            info["position"] = list(self.controller.current_position)
+        if self.source is not None:
+            info["source"] = self.source.stats()
+        if self.capture_stats is not None:
+            info["capture"] = self.capture_stats.as_dict()
+        if self.ring is not None:
+            info["ring"] = self.ring.stats()
+        return info
+
+
+class CameraRegistry:
+    """Cameras by camera_id, the first one added is the default used by the unprefixed routes"""
+
+    def __init__(self):
+        self._cameras = OrderedDict()
+
+    def add(self, camera):
+        if camera.camera_id in self._cameras:
+            raise ValueError(f"Camera {camera.camera_id} already registered")
+        self._cameras[camera.camera_id] = camera
+        return camera
+
+    def get(self, camera_id):
+        """Camera for camera_id, KeyError if there is none"""
+        return self._cameras[camera_id]
+
+    @property
+    def default(self):
+        return next(iter(self._cameras.values()))
+
+    def split_path(self, path):
+        """
+        "/cameras/rgb1/image" -> (camera rgb1, "/image"), any other path -> (default camera, path).
+        An unknown camera_id gives (None, path).
+        """
+        if not path.startswith(CAMERA_PREFIX):
+            return self.default, path
+        camera_id, _, rest = path[len(CAMERA_PREFIX):].partition("/")
+        return self._cameras.get(camera_id), "/" + rest
+
+    def start(self):
+        for camera in self:
+            camera.start()
+
+    def stop(self):
+        for camera in self:
+            camera.stop()
+
+    def __iter__(self):
+        return iter(list(self._cameras.values()))
+
+    def __len__(self):
+        return len(self._cameras)
+
+
+def parse_cameras(spec):
+    """
+    "main=emulator,rgb1=rgb:0,synth=synthetic:bars:640x480@10" -> [(camera_id, kind, option), ...]
+    """
+    cameras = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        camera_id, _, rest = item.partition("=")
+        kind, _, option = rest.partition(":")
+        if not camera_id or "/" in camera_id:
+            raise ValueError(f"Bad camera id in {item!r}")
+        if kind not in KINDS:
+            raise ValueError(f"Unknown camera kind {kind!r} in {item!r}, use one of {KINDS}")
+        cameras.append((camera_id, kind, option or None))
+    return cameras
+
+
+def build_registry(spec, pool=None, limits=None):
+    registry = CameraRegistry()
+    for camera_id, kind, option in parse_cameras(spec):
+        registry.add(Camera(camera_id, kind, option, pool, limits))
+        logging.info(f"Camera {camera_id}: {kind}{' ' + option if option else ''}")
+    return registry
+
+
+def seed_from_file(camera, path):
+    """Shows the last saved view of a camera until it publishes its first frame"""
+    if camera.store.seq == 0 and os.path.exists(path):
+        image = cv2.imread(path)
+        if image is not None:
+            camera.store.publish(image)
@@ -0,0 +1,163 @@
+"""
+Pre-trigger recording: the last seconds of a camera kept in memory as JPEGs,
+written out to a clip on request without pausing capture
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import cv2
+import numpy as np
+
+CLIP_FORMATS = ("avi", "mjpeg")
+CLIP_DIR = "clips"
+
+
+class FrameRing:
+    """
+    Encoded frames of the last `seconds`, never more than max_bytes in total.
+    The oldest frames are dropped first, by age or to stay under the byte cap.
+    """
+
+    def __init__(self, seconds=10.0, max_bytes=64 * 1024 * 1024, quality=90):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.nbytes = 0
+        self.added = 0
+        self.evicted = 0
+        self._frames = deque()  # (timestamp, jpeg bytes)
+        self._lock = threading.Lock()
+
+    def add_image(self, image, timestamp=None):
+        """Encodes image and adds it, returns the JPEG size"""
+        _, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return self.add(jpeg.tobytes(), timestamp)
+
+    def add(self, jpeg, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            self._frames.append((timestamp, jpeg))
+            self.nbytes += len(jpeg)
+            self.added += 1
+            self._evict(timestamp)
+        return len(jpeg)
+
+    def _evict(self, now):
+        frames = self._frames
+        # always keep the newest frame, even if it alone is over the cap
+        while len(frames) > 1 and (self.nbytes > self.max_bytes or now - frames[0][0] > self.seconds):
+            _, jpeg = frames.popleft()
+            self.nbytes -= len(jpeg)
+            self.evicted += 1
+
+    def snapshot(self, seconds=None):
+        """(timestamp, jpeg) pairs of the last seconds (everything held by default), oldest first"""
+        with self._lock:
+            frames = list(self._frames)
+        if seconds is not None and frames:
+            start = frames[-1][0] - seconds
+            frames = [frame for frame in frames if frame[0] >= start]
+        return frames
+
+    def stats(self):
+        with self._lock:
+            frames = len(self._frames)
+            span = self._frames[-1][0] - self._frames[0][0] if frames else 0.0
+        return {"frames": frames, "bytes": self.nbytes, "max_bytes": self.max_bytes,
+                "seconds": round(span, 3), "max_seconds": self.seconds,
+                "added": self.added, "evicted": self.evicted}
+
+    def __len__(self):
+        return len(self._frames)
+
+
+def clip_fps(frames):
+    """Average frame rate of (timestamp, jpeg) pairs, 1 for a single frame"""
+    if len(frames) < 2 or frames[-1][0] <= frames[0][0]:
+        return 1.0
+    return (len(frames) - 1) / (frames[-1][0] - frames[0][0])
+
+
+def write_clip(frames, path, fmt="avi"):
+    """
+    Writes (timestamp, jpeg) pairs to path. mjpeg concatenates the JPEGs as they
+    are, avi is a Motion-JPEG AVI at the average rate of the frames.
+    """
+    root, ext = os.path.splitext(path)
+    # VideoWriter picks the container by extension, keep it on the temporary file
+    tmp_path = f"{root}.part{ext}"
+    if fmt == "mjpeg":
+        with open(tmp_path, "wb") as file:
+            for _, jpeg in frames:
+                file.write(jpeg)
+    elif fmt == "avi":
+        first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        size = (first.shape[1], first.shape[0])
+        writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"MJPG"), clip_fps(frames), size)
+        if not writer.isOpened():
+            raise IOError(f"Cannot open video writer for {path}")
+        try:
+            for _, jpeg in frames:
+                image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if (image.shape[1], image.shape[0]) != size:
+                    image = cv2.resize(image, size)
+                writer.write(image)
+        finally:
+            writer.release()
+    else:
+        raise ValueError(f"Unknown clip format {fmt}, use one of {CLIP_FORMATS}")
+    os.replace(tmp_path, path)
+
+
+class ClipExporter:
+    """
+    Writes clips on background threads. export() copies the frame list (the
+    JPEG bytes are shared, not copied) and returns at once, capture keeps
+    adding to the ring while the clip is written.
+    """
+
+    def __init__(self, directory=CLIP_DIR, max_history=256):
+        self.directory = directory
+        self.max_history = max_history
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()  # clip id -> status dict
+        self._lock = threading.Lock()
+
+    def export(self, ring, seconds=None, fmt="avi", name="clip"):
+        """Clip id of a new export of the last seconds of ring, ValueError if there is nothing to export"""
+        if fmt not in CLIP_FORMATS:
+            raise ValueError(f"Unknown clip format {fmt}, use one of {CLIP_FORMATS}")
+        frames = ring.snapshot(seconds)
+        if not frames:
+            raise ValueError("No frames buffered")
+        clip_id = next(self._ids)
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(frames[-1][0]))
+        path = os.path.join(self.directory, f"{name}_{stamp}_{clip_id}.{fmt}")
+        job = {"id": clip_id, "state": "queued", "path": path, "format": fmt, "frames": len(frames),
+               "seconds": round(frames[-1][0] - frames[0][0], 3)}
+        with self._lock:
+            self._jobs[clip_id] = job
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+        threading.Thread(target=self._write, args=(job, frames), name=f"clip-{clip_id}", daemon=True).start()
+        return clip_id
+
+    def _write(self, job, frames):
+        job["state"] = "writing"
+        start = time.perf_counter()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_clip(frames, job["path"], job["format"])
+        except Exception as error:
+            logging.exception(f"Clip {job['id']} failed")
+            job.update(state="failed", error=str(error))
+            return
+        job.update(state="done", bytes=os.path.getsize(job["path"]),
+                   write_ms=round((time.perf_counter() - start) * 1000, 1))
+
+    def status(self, clip_id):
+        return self._jobs.get(clip_id)
@@ -0,0 +1,75 @@
+"""
+Bounded cache of encoded frames, keyed by frame version and output variant
+"""
+import base64
+import threading
+from collections import OrderedDict
+
+
+class EncodedFrame:
+    """JPEG bytes of one rendered variant, base64 string made on first use"""
+    __slots__ = ("jpeg", "_base64")
+
+    def __init__(self, jpeg):
+        self.jpeg = jpeg
+        self._base64 = None
+
+    @property
+    def base64(self):
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.jpeg).decode("utf-8")
+        return self._base64
+
+
+class EncodedFrameCache:
+    """
+    LRU cache of EncodedFrame objects.
+
+    Keys are (version, variant...) tuples, where version changes with every
+    new source frame (frame store sequence number or file mtime), so entries
+    for old frames simply age out. Requests for the same key between camera
+    updates cost only a lookup.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_create(self, key, render, entry_type=EncodedFrame):
+        """
+        Cached entry for key, otherwise entry_type(render()) is stored, render()
+        returns JPEG bytes for the default EncodedFrame entries.
+        Concurrent misses of the same key may render twice, the result is identical.
+        """
+        entry = self.get(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            entry = entry_type(render())
+            self.put(key, entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,122 @@
+"""
+In-memory frame bus shared by the camera producers and the backend endpoints
+"""
+import asyncio
+import os
+import threading
+import time
+
+import cv2
+
+
+class Frame:
+    """
+    One published frame. `seq` grows by one on every publish, so consumers can
+    tell a new frame from one they have already seen without comparing pixels.
+
+    A frame can be published with a render function instead of an image, it is
+    then rendered once, by the first consumer that reads `image`.
+    """
+    __slots__ = ("seq", "timestamp", "_image", "_render", "_lock")
+
+    def __init__(self, seq, image, timestamp, render=None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self._image = image
+        self._render = render
+        self._lock = threading.Lock() if render is not None else None
+
+    @property
+    def rendered(self):
+        return self._image is not None
+
+    @property
+    def image(self):
+        if self._image is None and self._render is not None:
+            with self._lock:
+                if self._image is None:
+                    self._image = self._render()
+                    self._render = None
+        return self._image
+
+
+class FrameStore:
+    """
+    Holds the latest decoded frame with a sequence number.
+
+    Producers (emulator, RGB camera) call publish(image) or publish(render=fn)
+    when rendering should wait until somebody looks; readers call latest() or
+    wait for the next frame with wait() from a thread or next_frame() from the
+    asyncio loop. Published images must not be modified afterwards, readers
+    get the same array without a copy.
+
+    If snapshot_path is set, every published frame is also written to disk
+    (atomically, through a temporary file) for tools that still read the JPEG.
+    """
+
+    def __init__(self, snapshot_path=None):
+        self.snapshot_path = snapshot_path
+        self._frame = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._waiters = set()  # (loop, asyncio.Event) of async readers
+
+    def publish(self, image=None, render=None):
+        with self._cond:
+            self._seq += 1
+            frame = Frame(self._seq, image, time.time(), render)
+            self._frame = frame
+            self._cond.notify_all()
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+        if self.snapshot_path is not None:
+            self._write_snapshot(frame.image)
+        return frame.seq
+
+    def latest(self):
+        """Latest Frame or None if nothing was published yet"""
+        return self._frame
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def wait(self, after_seq=0, timeout=None):
+        """Block until a frame newer than after_seq is published, None on timeout"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq, timeout)
+            frame = self._frame
+        if frame is None or frame.seq <= after_seq:
+            return None
+        return frame
+
+    async def next_frame(self, after_seq=0, timeout=None):
+        """Async version of wait() that does not occupy a thread"""
+        frame = self._frame
+        if frame is not None and frame.seq > after_seq:
+            return frame
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        with self._cond:
+            self._waiters.add(waiter)
+        try:
+            # re-check, a frame may have been published while registering
+            frame = self._frame
+            if frame is None or frame.seq <= after_seq:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return None
+                frame = self._frame
+        finally:
+            with self._cond:
+                self._waiters.discard(waiter)
+        return frame
+
+    def _write_snapshot(self, image):
+        root, ext = os.path.splitext(self.snapshot_path)
+        tmp_path = f"{root}.tmp{ext}"
+        if cv2.imwrite(tmp_path, image):
+            os.replace(tmp_path, self.snapshot_path)
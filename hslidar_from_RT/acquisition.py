@@ -0,0 +1,163 @@
+import threading
+import time
+import numpy as np
+from typing import NoReturn, Optional, Tuple
+
+RING_SLOTS = 512  # lines, about 235 MB of 224 x 1024 uint16 frames
+FETCH_TIMEOUT = 0.5  # s, how often a waiting fetch checks for stop
+
+
+class LineRing:
+    """
+    Preallocated ring of sensor lines between one producer (the acquisition
+    thread) and one consumer (the scan writer). No locks: only the producer moves
+    `written`, only the consumer moves `read`, and a slot is published by
+    advancing `written` after it has been filled. When the ring is full the new
+    line is dropped, lines already in it are never overwritten unread.
+
+    With keep_all=False there is no consumer (live view): the producer moves
+    `read` itself and a full ring overwrites its oldest line instead.
+
+    latest() gives a copy of the newest line to anyone else (the GUI preview).
+    """
+
+    def __init__(self, slots: int, height: int, width: int, dtype=np.uint16, keep_all: bool = True):
+        self.slots = slots
+        self.keep_all = keep_all
+        self.lines = np.empty((slots, height, width), dtype)
+        self.timestamps = np.empty(slots, np.float64)
+        self.written = 0
+        self.read = 0
+        self.dropped = 0
+        self.overwritten = 0
+        self.max_fill = 0
+        self._available = threading.Event()
+
+    def put(self, data: np.ndarray, timestamp: float) -> bool:
+        fill = self.written - self.read
+        if fill >= self.slots:
+            if self.keep_all:
+                self.dropped += 1
+                return False
+            self.read += 1
+            self.overwritten += 1
+            fill -= 1
+        slot = self.written % self.slots
+        self.lines[slot] = data.reshape(self.lines.shape[1:])
+        self.timestamps[slot] = timestamp
+        self.written += 1
+        self.max_fill = max(self.max_fill, fill + 1)
+        self._available.set()
+        return True
+
+    def peek(self, timeout: Optional[float] = None) -> Optional[Tuple[int, np.ndarray, float]]:
+        """(line number, line, timestamp) of the oldest unread line, None if there is none within timeout"""
+        if self.read == self.written:
+            self._available.clear()
+            # put() may have published between the check and the clear
+            if self.read == self.written and not self._available.wait(timeout):
+                return None
+        slot = self.read % self.slots
+        return self.read, self.lines[slot], self.timestamps[slot]
+
+    def release(self) -> NoReturn:
+        """The line from peek() is written, its slot can be reused"""
+        self.read += 1
+
+    def latest(self) -> Optional[Tuple[int, np.ndarray]]:
+        """(line number, copy) of the newest line, None before the first"""
+        written = self.written
+        if not written:
+            return None
+        return written - 1, self.lines[(written - 1) % self.slots].copy()
+
+    def __len__(self):
+        return self.written - self.read
+
+
+class AcquisitionWorker:
+    """
+    Owns the ImageAcquirer once started: fetches buffers on its own thread as fast
+    as the sensor delivers, copies each into the ring and hands the buffer straight
+    back. The ring is allocated on the first buffer, with its size and type.
+
+    dropped counts lines lost to a full ring, late the buffers that came more than
+    1.5 frame periods after the previous one (the sensor or the host fell behind).
+    keep_all=True is for a consumer that takes every line off the ring (a scan,
+    a reference), keep_all=False for live view, where only latest() is read.
+    """
+
+    def __init__(self, ia, fps: float, slots: int = RING_SLOTS, keep_all: bool = True):
+        self._ia = ia
+        self.period = 1.0 / fps
+        self.slots = slots
+        self.keep_all = keep_all
+        self.ring = None
+        self.fetched = 0
+        self.late = 0
+        self.timeouts = 0
+        self.error = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='hspec-acquisition', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> NoReturn:
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._ready.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def wait_ring(self, timeout: Optional[float] = None) -> Optional[LineRing]:
+        """The ring once the first line is in, None if stopped before"""
+        self._ready.wait(timeout)
+        return self.ring
+
+    def latest(self) -> Optional[Tuple[int, np.ndarray]]:
+        return self.ring.latest() if self.ring is not None else None
+
+    def _run(self):
+        previous = None
+        try:
+            while not self._stop.is_set():
+                buffer = self._ia.try_fetch(timeout=FETCH_TIMEOUT)
+                if buffer is None:
+                    self.timeouts += 1
+                    continue
+                with buffer:
+                    now = time.time()
+                    component = buffer.payload.components[0]
+                    if self.ring is None:
+                        self.ring = LineRing(self.slots, component.height, component.width, component.data.dtype,
+                                             self.keep_all)
+                        self._ready.set()
+                    self.ring.put(component.data, now)
+                self.fetched += 1
+                if previous is not None and now - previous > 1.5 * self.period:
+                    self.late += 1
+                previous = now
+        except Exception as error:
+            self.error = error
+            print(f'[ERROR] Acquisition stopped: {error}')
+        finally:
+            self._ready.set()
+
+    def stats(self) -> dict:
+        ring = self.ring
+        return {
+            'fetched': self.fetched,
+            'dropped': ring.dropped if ring is not None else 0,
+            'overwritten': ring.overwritten if ring is not None else 0,
+            'late': self.late,
+            'timeouts': self.timeouts,
+            'queued': len(ring) if ring is not None else 0,
+            'max_queued': ring.max_fill if ring is not None else 0,
+            'slots': self.slots,
+        }
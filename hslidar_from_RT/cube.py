@@ -0,0 +1,66 @@
+import numpy as np
+from typing import Optional
+
+FRAME_BANDS, FRAME_SAMPLES = 224, 1024  # Specim frame: bands x samples
+
+
+class CubeAssembler:
+    """
+    Hyperspectral cube built one scan line at a time in the legacy layout that
+    frame_stitching returns: (samples, lines, bands), sample axis reversed by the
+    rot90. capturing writes lines x bands x samples BIL instead (envi_writer).
+
+    Lines are stored contiguously in a (lines, samples, bands) buffer that is
+    preallocated for the planned number of lines and grows geometrically past it,
+    so each frame is copied once. `cube` is a (samples, lines, bands) view of the
+    lines added so far, without a copy.
+    """
+
+    def __init__(self, lines: int = 0, samples: int = FRAME_SAMPLES, bands: int = FRAME_BANDS,
+                 dtype=None, growth: float = 1.5):
+        self.samples = samples
+        self.bands = bands
+        self.growth = growth
+        self._planned = max(int(lines), 1)
+        self._dtype = dtype
+        self._buffer = None if dtype is None else np.empty((self._planned, samples, bands), dtype)
+        self._lines = 0
+
+    def add_frame(self, data: np.ndarray, height: Optional[int] = None, width: Optional[int] = None) -> int:
+        """
+        Raw sensor frame (bands x samples, flat as delivered by the buffer or 2D),
+        returns its line index
+        """
+        frame = data.reshape(height or self.bands, width or self.samples)
+        return self.add_line(np.rot90(frame))
+
+    def add_line(self, line: np.ndarray) -> int:
+        """One (samples, bands) line"""
+        if self._buffer is None:
+            self._buffer = np.empty((self._planned, self.samples, self.bands), self._dtype or line.dtype)
+        elif self._lines == len(self._buffer):
+            self._grow()
+        self._buffer[self._lines] = line
+        self._lines += 1
+        return self._lines - 1
+
+    def _grow(self):
+        grown = np.empty((max(int(len(self._buffer) * self.growth), len(self._buffer) + 1),)
+                         + self._buffer.shape[1:], self._buffer.dtype)
+        grown[:self._lines] = self._buffer[:self._lines]
+        self._buffer = grown
+
+    @property
+    def lines(self) -> np.ndarray:
+        """(lines, samples, bands) view of the lines added so far"""
+        if self._buffer is None:
+            return np.empty((0, self.samples, self.bands), self._dtype or np.uint16)
+        return self._buffer[:self._lines]
+
+    @property
+    def cube(self) -> np.ndarray:
+        """(samples, lines, bands) view, the layout saved to ENVI"""
+        return self.lines.swapaxes(0, 1)
+
+    def __len__(self):
+        return self._lines
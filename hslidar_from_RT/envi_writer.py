@@ -0,0 +1,141 @@
+import os
+import sys
+import numpy as np
+from typing import NoReturn, Optional, Sequence
+from cube import FRAME_BANDS
+from raw_store import FRAMES
+
+# ENVI header 'data type' codes
+ENVI_DATA_TYPES = {
+    np.dtype(np.uint8): 1, np.dtype(np.int16): 2, np.dtype(np.int32): 3, np.dtype(np.float32): 4,
+    np.dtype(np.float64): 5, np.dtype(np.uint16): 12, np.dtype(np.uint32): 13, np.dtype(np.int64): 14,
+    np.dtype(np.uint64): 15,
+}
+
+
+class EnviBilWriter:
+    """
+    ENVI BIL image written line by line while scanning. `<base>.img` is
+    preallocated for the planned number of lines and memory-mapped, a sensor
+    frame (bands x samples) is exactly one BIL line and is copied into its slot
+    as is, nothing of the scan is held in RAM beyond the page cache. Past the
+    planned lines the file grows by `growth`.
+
+    close() trims the file to the lines captured and writes `<base>.hdr`. The
+    header has a wavelength field only when calibrated band centres are given.
+    """
+
+    def __init__(self, base: str, lines: int, bands: int, samples: int, dtype=np.uint16,
+                 wavelengths: Optional[Sequence[float]] = None, growth: float = 1.5, **metadata):
+        self.img_path = base + '.img'
+        self.hdr_path = base + '.hdr'
+        self.bands = bands
+        self.samples = samples
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in ENVI_DATA_TYPES:
+            raise ValueError(f'No ENVI data type for {self.dtype}')
+        if wavelengths is not None and len(wavelengths) != bands:
+            raise ValueError(f'{len(wavelengths)} wavelengths for {bands} bands')
+        self.wavelengths = wavelengths
+        self.growth = growth
+        self.metadata = metadata
+        self._capacity = max(int(lines), 1)
+        self._map = np.memmap(self.img_path, self.dtype, 'w+', shape=(self._capacity, bands, samples))
+        self._lines = 0
+
+    def add_frame(self, data: np.ndarray) -> int:
+        """Raw sensor frame (bands x samples, flat or 2D), returns its line index"""
+        if self._lines == self._capacity:
+            self._grow()
+        self._map[self._lines] = data.reshape(self.bands, self.samples)
+        self._lines += 1
+        return self._lines - 1
+
+    def line(self, index: int) -> np.ndarray:
+        """(bands, samples) view of a written line"""
+        return self._map[index]
+
+    def _grow(self):
+        self._map.flush()
+        self._capacity = max(int(self._capacity * self.growth), self._capacity + 1)
+        del self._map
+        with open(self.img_path, 'r+b') as file:
+            file.truncate(self._capacity * self._line_bytes)
+        self._map = np.memmap(self.img_path, self.dtype, 'r+', shape=(self._capacity, self.bands, self.samples))
+
+    @property
+    def _line_bytes(self) -> int:
+        return self.bands * self.samples * self.dtype.itemsize
+
+    def close(self) -> NoReturn:
+        if self._map is None:
+            return
+        self._map.flush()
+        self._map = None
+        with open(self.img_path, 'r+b') as file:
+            file.truncate(self._lines * self._line_bytes)
+        self.write_header()
+
+    def write_header(self) -> NoReturn:
+        byte_order = self.dtype.byteorder
+        big_endian = byte_order == '>' or (byte_order == '=' and sys.byteorder == 'big')
+        header = ['ENVI',
+                  f'samples = {self.samples}',
+                  f'lines = {self._lines}',
+                  f'bands = {self.bands}',
+                  'header offset = 0',
+                  'file type = ENVI Standard',
+                  f'data type = {ENVI_DATA_TYPES[self.dtype]}',
+                  'interleave = bil',
+                  f'byte order = {int(big_endian)}']
+        header += [f'{key} = {value}' for key, value in self.metadata.items()]
+        if self.wavelengths is not None:
+            header.append('wavelength units = Nanometers')
+            header.append('wavelength = {' + ', '.join(f'{w:.2f}' for w in self.wavelengths) + '}')
+        tmp_path = self.hdr_path + '.part'
+        with open(tmp_path, 'w') as file:
+            file.write('\n'.join(header) + '\n')
+        os.replace(tmp_path, self.hdr_path)
+
+    def __len__(self):
+        return self._lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def envi_from_raw(f, base: str, frames: Optional[int] = None, wavelengths: Optional[Sequence[float]] = None,
+                  radiometry=None, **metadata) -> int:
+    """
+    ENVI BIL image of a raw HDF5 scan (a RawFrameWriter file or the old one dataset
+    per frame layout), line for line what capturing writes during the scan.
+    radiometry (a radiometry.Reflectance) writes reflectance. Returns the line count.
+    """
+    if FRAMES in f:
+        dataset = f[FRAMES]
+        lines, bands, samples = dataset.shape
+        step = dataset.chunks[0] if dataset.chunks else 64
+        dtype = dataset.dtype
+    else:
+        lines = sum(1 for key in f.keys() if key.isdigit())
+        first = f['0']
+        bands, samples = first.shape if first.ndim == 2 else (FRAME_BANDS, first.size // FRAME_BANDS)
+        step = 1
+        dtype = first.dtype
+    lines = lines if frames is None else min(frames, lines)
+    if radiometry is not None:
+        dtype = radiometry.dtype
+        converted = np.empty((bands, samples), dtype)
+        if dtype == np.uint16:
+            metadata['reflectance scale factor'] = radiometry.scale
+    with EnviBilWriter(base, lines, bands, samples, dtype, wavelengths, **metadata) as image:
+        for start in range(0, lines, step):
+            chunk = f[FRAMES][start:min(start + step, lines)] if FRAMES in f else [f[str(start)][:]]
+            for frame in chunk:
+                if radiometry is not None:
+                    frame = radiometry.apply(frame, out=converted)
+                image.add_frame(frame)
+    return lines
@@ -20,9 +20,18 @@ import warnings
 warnings.simplefilter("ignore", ResourceWarning)
 matplotlib.use('TkAgg')
 
-def create_gen(expos: int, frames: int, name: str, specim, FPS, posit):
+def start_specim(expos: int, frames: int, name: str, specim, FPS, posit=None):
+    # acquisition runs on its own thread, the returned worker gives the newest line
     return specim.capturing(expos, frames, name, FPS, posit) if frames else specim.calibration(expos, FPS)
 
+
+def new_line(worker, seen: int):
+    """(line number, rotated line) of the newest line if it is newer than seen, else None"""
+    latest = worker.latest()
+    if latest is None or latest[0] <= seen:
+        return None
+    return latest[0], np.rot90(latest[1])
+
 def create_predefined_frame(width, height, text="sample", color=(255, 255, 255), font_scale=1.0, thickness=2):
   """
   Creates a predefined frame with text on it.
@@ -69,6 +78,9 @@ def App():
         [sg.B('LIVE', size=(10, 1), enable_events=True, key='-LIVE'),
          sg.B('CAPTURE', size=(10, 1), enable_events=True, key='-CAPTURE')],
         [sg.B('STOP', size=(10, 1), enable_events=True, key='-STOP_LIVE')],
+        [sg.B('DARK', size=(10, 1), enable_events=True, key='-DARK'),
+         sg.B('WHITE', size=(10, 1), enable_events=True, key='-WHITE')],
+        [sg.T('Reference frames'), sg.In('100', size=(80, 1), k='-REF_FRAMES', background_color=BGRND_COLOR)],
         [sg.T('Exposition, us'), sg.In('30000', size=(80, 1), k='-EXPOS_VALUE', background_color=BGRND_COLOR)],
         [sg.T('FPS'), sg.In('20', size=(80, 1), k='-FPS', background_color=BGRND_COLOR)],
         [sg.T('Data name'), sg.In(size=(30, 1), k='-DATA_NAME', background_color=BGRND_COLOR)],
@@ -170,6 +182,7 @@ def App():
             if event == sg.WIN_CLOSED:
                 try:
                     window.close()
+                    specim.stop_acquisition()
                     specim.close_camera()
                     break
                 except:
@@ -261,54 +274,62 @@ def App():
                         current_min_delta = delta_w_min
                 hex_w = current_min_speed
                 print('vehicle for platform:  ', hex_w)
-                gen = create_gen(int(values['-EXPOS_VALUE']), n_frames, values['-DATA_NAME'], specim,
-                                 int(values['-FPS']), int(values['-SET_END']))
+                scan = start_specim(int(values['-EXPOS_VALUE']), n_frames, values['-DATA_NAME'], specim,
+                                    int(values['-FPS']), int(values['-SET_END']))
+                seen_line = -1
 
             elif event == '-LIVE':
                 print('[INFO] Moving to calibration position...')
                 print('[INFO] Start calibration')
                 calb_flag = 1
-                gen_calb = create_gen(int(values['-EXPOS_VALUE']), 0, '', specim, int(values['-FPS']))
-            elif event == '-STOP_LIVE':
+                live = start_specim(int(values['-EXPOS_VALUE']), 0, '', specim, int(values['-FPS']))
+                seen_line = -1
+            elif event in ('-DARK', '-WHITE') and not calb_flag and not capture_state_flag:
+                # blocks the window for the few seconds of the reference, nothing else is running then
+                print(f"[INFO] Collecting {'dark' if event == '-DARK' else 'white'} reference...")
+                specim.collect_reference(int(values['-EXPOS_VALUE']), int(values['-FPS']),
+                                         int(values['-REF_FRAMES']), dark=event == '-DARK')
+            elif event == '-STOP_LIVE' and calb_flag == 1:
                 calb_flag = 0
+                specim.stop_acquisition()
                 print('[INFO] Stop calibration')
 
             #######################################################################################################
-            ########################## CAPTURE GENERATORS #########################################################
+            ########################## CAPTURE PREVIEW ############################################################
             #######################################################################################################
+            # the waterfall shows the newest line at the GUI's pace, lines in between are only skipped here
             #print(ptr.get_current_position())
             if calb_flag == 1:
-                a = next(gen_calb)
-
-                if len(fall) == 1024:
-                    fall.popleft()
-                fall.append(a[:, 20] / 20)
-                imgbytes4 = cv2.imencode('.png', np.rot90(np.array(fall)))[1].tobytes()
-                window['-WATERFALL'].update(data=imgbytes4)
-
-            try:
+                line = new_line(live, seen_line)
+                if line is not None:
+                    seen_line, a = line
+                    if len(fall) == 1024:
+                        fall.popleft()
+                    fall.append(a[:, 20] / 20)
+                    imgbytes4 = cv2.imencode('.png', np.rot90(np.array(fall)))[1].tobytes()
+                    window['-WATERFALL'].update(data=imgbytes4)
 
-                if capture_state_flag == 1:
-                    window['-SONY'].update(data=cv2.imencode('.png', W)[1].tobytes())
-                    ptr.move_right(str(hex_w))
-                    a = next(gen)
+            if capture_state_flag == 1:
+                window['-SONY'].update(data=cv2.imencode('.png', W)[1].tobytes())
+                ptr.move_right(str(hex_w))
+                line = new_line(scan, seen_line)
+                if line is not None:
+                    new_lines = line[0] - seen_line
+                    seen_line, a = line
                     if len(fall) == 1024:
                         fall.popleft()
                     fall.append(a[:, 20] * 20)
                     imgbytes4 = cv2.imencode('.png', np.rot90(np.array(fall)))[1].tobytes()
                     window['-WATERFALL'].update(data=imgbytes4)
-                    frame_counter += 1
-                    if frame_counter == 9:
-                        frame_counter = 0
-                        distance_arr_cnt += 1
-                    all_fr_cnt += 1
-            except StopIteration:
-                print("Stop iter")
-                capture_state_flag = 0
-                frame_counter = 0
-                specim.close_ia()
-                ptr.stop()
-                print('[INFO] Stop capturing')
+                    frame_counter += new_lines
+                    distance_arr_cnt += frame_counter // 9
+                    frame_counter %= 9
+                    all_fr_cnt += new_lines
+                if not scan.running:
+                    capture_state_flag = 0
+                    frame_counter = 0
+                    ptr.stop()
+                    print(f'[INFO] Stop capturing {scan.stats()}')
         except Exception as error:
             print(error)
 
@@ -7,13 +7,26 @@ import numpy as np
 #import cv2
 import h5py
 from datetime import datetime as dt
+import math
 import os
-from typing import NoReturn, Iterator
+import threading
+from typing import NoReturn, Optional
 import scanner
+from cube import CubeAssembler
+from raw_store import RawFrameWriter, FRAMES
+from envi_writer import EnviBilWriter
+from acquisition import AcquisitionWorker, RING_SLOTS
+from radiometry import RunningStats, Reflectance
 
 class Camera:
     def __init__(self):
         self._ia = None
+        self.acquisition = None  # AcquisitionWorker while the camera is running
+        self._scan = None  # scan writer thread of the last capturing
+        # the GUI and the scan writer's finally may both stop the acquisition
+        self._acquisition_lock = threading.Lock()
+        self.dark = None  # RunningStats of the last dark reference
+        self.white = None  # RunningStats of the last white reference
         self._cti_file = r"C:\Program Files\MATRIX VISION\mvIMPACT Acquire\bin\x64\mvGenTLProducer.cti"
         self._h = Harvester()
         self._h.add_file(self._cti_file)
@@ -42,59 +55,178 @@ class Camera:
         self._ia.remote_device.node_map.AcquisitionFrameRate.value = FPS
 
     def close_camera(self) -> NoReturn:
+        # the scan writer still closes its files after the acquisition stops, wait for it
+        self.stop_acquisition()
+        if self._scan is not None and self._scan is not threading.current_thread():
+            self._scan.join()
         self._h.reset()
 
     @staticmethod
     def frame_stitching(f: h5py, frames: int):
+        # legacy offline path: in-memory (samples, lines, bands) cube with the sample axis
+        # reversed, the layout save_to_envi wrote before the scan went straight to disk.
+        # envi_writer.envi_from_raw gives the BIL image capturing writes now
         ptr = scanner.Ptr()
         ptr.stop()
         print('[INFO] Stitching frames')
-        image_arr = []
+        cube = CubeAssembler(frames)
+        if FRAMES in f:
+            # one (lines, height, width) dataset, read a chunk of lines at a time
+            step = f[FRAMES].chunks[0] if f[FRAMES].chunks else 64
+            for start in range(0, frames, step):
+                for frame in f[FRAMES][start:min(start + step, frames)]:
+                    cube.add_frame(frame)
+            return cube.cube
         for key in range(frames):
-            prom = (np.rot90(f[str(key)][:].reshape(224, 1024)))[:, np.newaxis, :]
-            image_arr = np.concatenate((image_arr, prom), axis=1) if f[str(key)].name != '/0' else prom
-        return image_arr
+            cube.add_frame(f[str(key)][:])
+        return cube.cube
 
-    def calibration(self, EXP: int, FPS) -> Iterator[np.ndarray]:
+    def start_acquisition(self, EXP: int, FPS, slots: int = RING_SLOTS, shutter: int = 1,
+                          keep_all: bool = True) -> AcquisitionWorker:
+        # the acquisition thread owns the ImageAcquirer until stop_acquisition,
+        # keep_all=False when nothing takes the lines off the ring (live view)
         self._ia = self._h.create(0)
         self.camera_params(EXP, FPS)
         self._ia.start()
-        self.shutter(1)
-        while True:
-            with self._ia.fetch() as buffer:
-                component = buffer.payload.components[0]
-                Data = component.data
-                frame_2d = Data.reshape(component.height, component.width)
-                fr = (np.rot90(frame_2d))
-            yield fr
+        self.shutter(shutter)
+        self.acquisition = AcquisitionWorker(self._ia, FPS, slots, keep_all).start()
+        return self.acquisition
 
-    def capturing(self, EXP: int, frames: int, data_name: str, FPS: int, posit) -> Iterator[np.ndarray]:
+    def stop_acquisition(self) -> NoReturn:
+        # idempotent, whoever comes second finds nothing left to stop
+        with self._acquisition_lock:
+            worker, self.acquisition = self.acquisition, None
+            if worker is None:
+                return
+            worker.stop()
+            print(f'[INFO] Acquisition {worker.stats()}')
+            self.close_ia()
+
+    def calibration(self, EXP: int, FPS) -> AcquisitionWorker:
+        # live view, the GUI shows worker.latest(), old lines are overwritten
+        return self.start_acquisition(EXP, FPS, keep_all=False)
+
+    def collect_reference(self, EXP: int, FPS, frames: int, dark: bool, settle: int = None) -> RunningStats:
+        """
+        Per-pixel mean/variance of frames lines, with the shutter closed for dark,
+        open (pointed at the white panel) for white. The first settle lines, half a
+        second by default, are skipped while the shutter moves.
+        """
+        settle = int(FPS) // 2 if settle is None else settle
+        worker = self.start_acquisition(EXP, FPS, shutter=-1 if dark else 1)
+        ring = worker.wait_ring()
+        stats = None
+        seen = 0
+        try:
+            while ring is not None and (stats is None or stats.count < frames):
+                line = ring.peek(timeout=1.0)
+                if line is None:
+                    if worker.running:
+                        continue
+                    break
+                if seen >= settle:
+                    stats = stats or RunningStats(line[1].shape)
+                    stats.add(line[1])
+                seen += 1
+                ring.release()
+        finally:
+            if dark:
+                self.shutter(1)
+            self.stop_acquisition()
+        if stats is None:
+            raise RuntimeError('No frames for the reference')
+        if dark:
+            self.dark = stats
+        else:
+            self.white = stats
+        print(f"[INFO] {'Dark' if dark else 'White'} reference: {stats.count} frames, "
+              f"mean {stats.mean.mean():.1f}, noise {stats.std.mean():.2f}")
+        return stats
+
+    def reflectance(self, dtype=np.float32) -> Optional[Reflectance]:
+        # from the last dark and white references, None until both are collected
+        if self.dark is None or self.white is None:
+            return None
+        return Reflectance.from_references(self.dark, self.white, dtype=dtype)
+
+    def capturing(self, EXP: int, frames: int, data_name: str, FPS: int, posit,
+                  compression=None, compression_opts=None, chunk_lines=64, wavelengths=None,
+                  slots: int = RING_SLOTS, reflectance_dtype=np.float32) -> AcquisitionWorker:
+        # compression of the raw HDF5 frames: None (fastest), 'lzf' or 'gzip' (compression_opts = level 0-9)
+        # the image goes straight to Datasets/<dir>/tuy.img (ENVI BIL, one scan line per frame),
+        # wavelengths: calibrated band centres in nm, without them the header has no wavelength field
+        # with dark and white references collected, the image holds reflectance (float32, or uint16
+        # times 10000), converted line by line, and the references are saved as calibration.npz;
+        # reflectance_dtype=None or no references keeps raw counts. POH.hdf5 always has raw counts
+        # lines are fetched on the acquisition thread and written on the scan thread, the GUI shows
+        # worker.latest(), the scan is saved once worker.running is False
         dir_name = data_name if data_name else dt.now().strftime("%H_%M")
         if not os.path.exists(os.getcwd() + fr'\Datasets\{dir_name}'):
             os.mkdir(os.getcwd() + fr'\Datasets\{dir_name}')
-        h5_file = h5py.File(fr"{os.getcwd()}\Datasets\{dir_name}\{'POH'}.hdf5", "w")
-        self._ia = self._h.create(0)
-        self.shutter(1)
-        self.camera_params(EXP, FPS)
-        self._ia.start()
-        frames_number = range(frames)
-        for frame in frames_number:
-            with self._ia.fetch() as buffer:
-                component = buffer.payload.components[0]
-                Data = component.data
-                h5_file.create_dataset(f"{frame}", data=Data)
-                frame_2d = Data.reshape(component.height, component.width)
-                fr = (np.rot90(frame_2d))
-            if frame != frames_number and ptr.get_current_position()>=posit:
-                yield fr
-            else:
-                break
-            # if scanner.Ptr().get_current_position() >=
+        radiometry = self.reflectance(reflectance_dtype) if reflectance_dtype is not None else None
+        if radiometry is not None:
+            radiometry.save(fr"{os.getcwd()}\Datasets\{dir_name}\calibration.npz")
+        worker = self.start_acquisition(EXP, FPS, slots)
+        self._scan = threading.Thread(target=self._write_scan, name='hspec-scan-writer', daemon=True,
+                                      args=(worker, EXP, frames, dir_name, FPS, posit, compression,
+                                            compression_opts, chunk_lines, wavelengths, radiometry))
+        self._scan.start()
+        return worker
 
-        image_arr = self.frame_stitching(h5_file, frames)
-        h5_file.close()
-        self.save_to_envi(image_arr, dir_name, 'tuy')
+    def _write_scan(self, worker: AcquisitionWorker, EXP: int, frames: int, dir_name: str, FPS: int, posit,
+                    compression, compression_opts, chunk_lines, wavelengths,
+                    radiometry: Optional[Reflectance]) -> NoReturn:
+        h5_path = fr"{os.getcwd()}\Datasets\{dir_name}\{'POH'}.hdf5"
+        raw = None  # RawFrameWriter, opened with the size of the first frame
+        image = None  # EnviBilWriter, likewise
+        ptr = scanner.Ptr()
+        # polled on its own thread, a line gets the last position read, NaN if the platform did not answer
+        positions = scanner.PositionPoller(ptr).start()
+        ring = worker.wait_ring()
+        lines = 0
+        try:
+            while ring is not None and lines < frames:
+                line = ring.peek(timeout=1.0)
+                if line is None:
+                    if worker.running:
+                        continue
+                    break
+                _, frame_2d, timestamp = line
+                position = positions.value
+                if raw is None:
+                    height, width = frame_2d.shape
+                    raw = RawFrameWriter(h5_path, height, width, frame_2d.dtype, chunk_lines,
+                                         compression, compression_opts, exposure=EXP, fps=FPS)
+                    metadata = {}
+                    if radiometry is not None:
+                        converted = np.empty((height, width), radiometry.dtype)
+                        if radiometry.dtype == np.uint16:
+                            metadata['reflectance scale factor'] = radiometry.scale
+                    image = EnviBilWriter(fr"{os.getcwd()}\Datasets\{dir_name}\tuy", frames, height, width,
+                                          radiometry.dtype if radiometry is not None else frame_2d.dtype,
+                                          wavelengths, exposure=EXP, fps=FPS, **metadata)
+                raw.append(frame_2d, timestamp, position)
+                if radiometry is not None:
+                    image.add_frame(radiometry.apply(frame_2d, out=converted))
+                else:
+                    image.add_frame(frame_2d)
+                ring.release()
+                lines += 1
+                if not math.isnan(position) and position < posit:
+                    break
+        finally:
+            positions.stop()
+            if raw is not None:
+                raw.close()
+            if image is not None:
+                image.close()
+            ptr.stop()
+            self.stop_acquisition()
+            print(f'[INFO] Scan saved, {lines} lines, {positions.misses} position requests without reply')
 
     def close_ia(self):
-        self._ia.stop()
-        self._ia.destroy()
+        if self._ia is None:
+            return
+        ia, self._ia = self._ia, None
+        ia.stop()
+        ia.destroy()
@@ -19,6 +19,17 @@ class Lidar:
         self._config.lidar_mode = client.LidarMode.MODE_2048x10
         client.set_config(self._hostname, self._config, persist=True, udp_dest_auto = True,)
 
+    @staticmethod
+    def accumulate_rows(range_img, start=1024, stop=2048):
+        # column sums of range_img[:, start:stop], accumulated in place in the first row
+        a = []
+        for i,z in enumerate(range_img[:, start:stop]):
+            if i == 0:
+                a = range_img[i, start:stop]
+            else:
+                a += range_img[i, start:stop]
+        return a
+
     def create_ply(self, path):
         source = client.Sensor(self._hostname, 7502, 7503)
         info = source.metadata
@@ -29,13 +40,7 @@ class Lidar:
         range_field = scan.field(client.ChanField.RANGE)
         range_img = client.destagger(info, range_field)
         range_img2 = range_img.copy()
-        a = []
-
-        for i,z in enumerate(range_img[:, 1024:2048]):
-            if i == 0:
-                a = range_img[i, 1024:2048]
-            else:
-                a += range_img[i, 1024:2048]
+        a = self.accumulate_rows(range_img)
 
         a = a/128
         new_arr = []
@@ -0,0 +1,86 @@
+import numpy as np
+from typing import NoReturn, Optional
+
+REFLECTANCE_SCALE = 10000  # uint16 reflectance: 10000 = 1.0, the usual ENVI 'reflectance scale factor'
+
+
+class RunningStats:
+    """
+    Per-pixel mean and variance of a stream of frames (Welford), without keeping
+    the frames: one float64 mean and sum of squared deviations per pixel.
+    """
+
+    def __init__(self, shape):
+        self.count = 0
+        self.mean = np.zeros(shape, np.float64)
+        self._m2 = np.zeros(shape, np.float64)
+        self._delta = np.empty(shape, np.float64)
+
+    def add(self, frame: np.ndarray) -> NoReturn:
+        self.count += 1
+        delta = self._delta
+        np.subtract(frame.reshape(self.mean.shape), self.mean, out=delta)
+        self.mean += delta / self.count
+        # m2 += (x - old mean) * (x - new mean)
+        delta *= frame.reshape(self.mean.shape) - self.mean
+        self._m2 += delta
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Sample variance, zeros until two frames are in"""
+        if self.count < 2:
+            return np.zeros_like(self.mean)
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+
+class Reflectance:
+    """
+    (raw - dark) / (white - dark) for one line at a time, from the dark and white
+    reference means. Pixels whose white is not above dark by min_signal counts
+    (dead or saturated) come out 0. dtype float32 gives reflectance as is,
+    uint16 gives it times `scale`, clipped to 0..65535.
+    """
+
+    def __init__(self, dark: np.ndarray, white: np.ndarray, dtype=np.float32, scale: int = REFLECTANCE_SCALE,
+                 min_signal: float = 1.0):
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.dtype(np.float32), np.dtype(np.uint16)):
+            raise ValueError(f'Reflectance is float32 or uint16, not {self.dtype}')
+        self.scale = scale if self.dtype == np.uint16 else 1
+        self.dark = np.asarray(dark, np.float32)
+        self.white = np.asarray(white, np.float32)
+        signal = self.white - self.dark
+        valid = signal > min_signal
+        self.gain = np.zeros_like(signal)
+        self.gain[valid] = self.scale / signal[valid]
+        self.bad_pixels = int(np.count_nonzero(~valid))
+        self._scratch = np.empty(self.dark.shape, np.float32)
+
+    @classmethod
+    def from_references(cls, dark: RunningStats, white: RunningStats, **kwargs) -> 'Reflectance':
+        return cls(dark.mean, white.mean, **kwargs)
+
+    def apply(self, raw: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Reflectance of one frame (same shape as the references, or flat)"""
+        if out is None:
+            out = np.empty(self.dark.shape, self.dtype)
+        scratch = out if self.dtype == np.float32 else self._scratch
+        np.subtract(raw.reshape(self.dark.shape), self.dark, out=scratch)
+        scratch *= self.gain
+        if self.dtype == np.uint16:
+            np.clip(scratch, 0, 65535, out=scratch)
+            np.rint(scratch, out=scratch)
+            np.copyto(out, scratch, casting='unsafe')
+        return out
+
+    def save(self, path: str) -> NoReturn:
+        np.savez(path, dark=self.dark, white=self.white, dtype=self.dtype.str, scale=self.scale)
+
+    @classmethod
+    def load(cls, path: str) -> 'Reflectance':
+        with np.load(path) as data:
+            return cls(data['dark'], data['white'], np.dtype(str(data['dtype'])), int(data['scale']))
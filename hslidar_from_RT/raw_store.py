@@ -0,0 +1,84 @@
+import time
+import h5py
+import numpy as np
+from typing import NoReturn, Optional
+
+FRAMES, TIMESTAMPS, POSITIONS = "frames", "timestamps", "positions"
+
+
+class RawFrameWriter:
+    """
+    Raw pushbroom frames appended to one resizable (lines, height, width) dataset,
+    chunked along lines, with per-line `timestamps` (unix seconds) and `positions`
+    (platform position, NaN when unknown) next to it.
+
+    Lines are collected in a one-chunk buffer and written a whole chunk at a time,
+    a compressed chunk is never read back and rewritten for each line. The last,
+    partial chunk is written on close. compression is None, 'lzf' or 'gzip'
+    (compression_opts = level 0-9).
+    """
+
+    def __init__(self, path: str, height: int, width: int, dtype=np.uint16, chunk_lines: int = 64,
+                 compression: Optional[str] = None, compression_opts: Optional[int] = None, **attrs):
+        self.path = path
+        self.chunk_lines = chunk_lines
+        self._file = h5py.File(path, "w")
+        self._frames = self._file.create_dataset(
+            FRAMES, shape=(0, height, width), maxshape=(None, height, width), dtype=dtype,
+            chunks=(chunk_lines, height, width), compression=compression, compression_opts=compression_opts)
+        self._timestamps = self._file.create_dataset(TIMESTAMPS, shape=(0,), maxshape=(None,), dtype=np.float64,
+                                                     chunks=(max(chunk_lines, 1024),))
+        self._positions = self._file.create_dataset(POSITIONS, shape=(0,), maxshape=(None,), dtype=np.float64,
+                                                    chunks=(max(chunk_lines, 1024),))
+        for key, value in attrs.items():
+            self._file.attrs[key] = value
+        self._buffer = np.empty((chunk_lines, height, width), dtype)
+        self._buffer_times = np.empty(chunk_lines, np.float64)
+        self._buffer_positions = np.empty(chunk_lines, np.float64)
+        self._buffered = 0
+        self._lines = 0
+
+    def append(self, frame: np.ndarray, timestamp: Optional[float] = None, position: float = np.nan) -> int:
+        """Adds one frame (flat or height x width), returns its line index"""
+        index = self._buffered
+        self._buffer[index] = frame.reshape(self._buffer.shape[1:])
+        self._buffer_times[index] = time.time() if timestamp is None else timestamp
+        self._buffer_positions[index] = position
+        self._buffered += 1
+        self._lines += 1
+        if self._buffered == self.chunk_lines:
+            self.flush()
+        return self._lines - 1
+
+    def flush(self) -> NoReturn:
+        """Writes the buffered lines"""
+        count = self._buffered
+        if not count:
+            return
+        start = len(self._frames)
+        for dataset, data in ((self._frames, self._buffer), (self._timestamps, self._buffer_times),
+                              (self._positions, self._buffer_positions)):
+            dataset.resize(start + count, axis=0)
+            dataset[start:start + count] = data[:count]
+        self._buffered = 0
+
+    def close(self) -> NoReturn:
+        if not self._file:
+            return
+        self.flush()
+        self._file.attrs['lines'] = self._lines
+        self._file.close()
+
+    def __len__(self):
+        return self._lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_lines(f: h5py.File, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+    """(lines, height, width) frames start:stop of a file written by RawFrameWriter"""
+    return f[FRAMES][start:stop]
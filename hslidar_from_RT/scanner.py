@@ -1,4 +1,6 @@
+import math
 import socket
+import threading
 
 #### Speed 0 - 9D
 #### PAN 0 - 157
@@ -71,19 +73,32 @@ scanner_speed = {
 }
 
 
+def position_value(reply):
+    """Pan position as one number from the [hh, ll] hex pair of get_current_position, NaN without a reply"""
+    if not reply:
+        return math.nan
+    return int(reply[0] + reply[1], 16)
+
+
 class UdpClient():
     def __init__(self):
         self._port = 6000
         self._host = '192.168.0.93'
+        self._timeout = 1.0  # s to wait for a reply, None without one
 
     def _client_up(self, cmd):
         UDPServerSocket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        UDPServerSocket.settimeout(self._timeout)
         _serverAddress = (self._host, self._port)
         UDPServerSocket.sendto(bytes.fromhex(cmd), _serverAddress)
         if '51' and '52' in cmd:
-            reply = UDPServerSocket.recv(8192)
+            try:
+                reply = UDPServerSocket.recv(8192)
+            except socket.timeout:
+                return None
+            finally:
+                UDPServerSocket.close()
             rep = bytes.hex(reply)
-            UDPServerSocket.close()
             return [rep[8:10], rep[10:12]]
 
 
@@ -138,3 +153,42 @@ class Ptr():
     def move_to(self, hh, ll):
         cmd = self._construct_cmd('71', f'{hh}', f'{ll}')
         return self._sock._client_up(cmd)
+
+
+class PositionPoller:
+    """
+    Asks the platform for its pan position on its own thread every interval
+    seconds, so nobody waits on the UDP round trip. `value` is the last reply,
+    NaN while there is none or when the last request got no answer.
+    """
+
+    def __init__(self, ptr, interval=0.05):
+        self._ptr = ptr
+        self.interval = interval
+        self.value = math.nan
+        self.replies = 0
+        self.misses = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='ptr-position', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                value = position_value(self._ptr.get_current_position())
+            except OSError as error:
+                print(f'[ERROR] Position request failed: {error}')
+                value = math.nan
+            if math.isnan(value):
+                self.misses += 1
+            else:
+                self.replies += 1
+            self.value = value
+            self._stop.wait(self.interval)
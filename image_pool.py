@@ -0,0 +1,117 @@
+"""
+Bounded thread pool that keeps blocking OpenCV and file work off the asyncio event loop
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ImageWorkerPool:
+    """
+    Runs blocking image functions (cv2.resize/imencode/imread, emulator renders)
+    on worker threads. cv2 releases the GIL, so concurrent viewers use several cores.
+
+    At most max_pending jobs are submitted at once, further callers wait in the
+    event loop without holding a thread. stats() reports the queue depth.
+    After shutdown() the next run() starts new worker threads (an app restarted
+    in the same process, e.g. on reload or in tests).
+    """
+
+    def __init__(self, workers=None, max_pending=64):
+        self.workers = workers or os.cpu_count() or 4
+        self.max_pending = max_pending
+        self._executor = None  # created by the first run()
+        self._slots = None  # asyncio.Semaphore, created on the running loop
+        self._lock = threading.Lock()
+        self.waiting = 0  # callers waiting for a slot
+        self.queued = 0  # submitted, not started yet
+        self.active = 0  # running on a worker thread
+        self.max_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0  # queued, then cancelled by shutdown() or by the caller
+        self.queue_time_total = 0.0
+        self.run_time_total = 0.0
+
+    async def run(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        # shutdown() may replace both while this job waits or runs
+        executor, slots = self._executor, self._slots
+        self.waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            with self._lock:
+                self.queued += 1
+                self.max_queued = max(self.max_queued, self.queued)
+            try:
+                future = executor.submit(self._call, time.perf_counter(), fn, args)
+            except RuntimeError:
+                # shut down while waiting for a slot
+                with self._lock:
+                    self.queued -= 1
+                    self.cancelled += 1
+                raise
+            future.add_done_callback(self._cancelled)
+            return await asyncio.wrap_future(future)
+        finally:
+            slots.release()
+
+    def _cancelled(self, future):
+        # a job cancelled before it started never runs _call, it leaves the queue here
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+                self.cancelled += 1
+
+    def _call(self, submitted, fn, args):
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self.queue_time_total += started - submitted
+        ok = False
+        try:
+            result = fn(*args)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.run_time_total += time.perf_counter() - started
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def stats(self):
+        with self._lock:
+            done = self.completed + self.failed
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "waiting": self.waiting,
+                "queued": self.queued,
+                "active": self.active,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "avg_queue_ms": round(self.queue_time_total / done * 1000, 3) if done else 0.0,
+                "avg_run_ms": round(self.run_time_total / done * 1000, 3) if done else 0.0,
+            }
+
+    def shutdown(self):
+        """Cancels queued jobs, the workers exit after the jobs they are running"""
+        executor, self._executor = self._executor, None
+        # the semaphore belongs to the event loop that is going away
+        self._slots = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
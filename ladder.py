@@ -0,0 +1,98 @@
+"""
+Encode ladder: a few sizes and qualities of every frame, encoded once, and the
+per-client bandwidth estimate used to pick a rung automatically
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+from frame_cache import EncodedFrame
+
+# rung -> (width, JPEG quality), height keeps the aspect ratio, None keeps the source size; smallest first
+RUNGS = OrderedDict([
+    ("thumb", (160, 50)),
+    ("small", (320, 70)),
+    ("medium", (640, 80)),
+    ("full", (None, 90)),
+])
+DEFAULT_RUNG = "small"
+AUTO = "auto"
+FRAME_BUDGET = 0.1  # seconds a client may spend downloading one frame in auto mode
+
+
+def encode_ladder(image):
+    """
+    {rung: JPEG bytes} for every rung. Each rung is resized from the previous
+    larger one, so the whole ladder costs little more than the full encode.
+    """
+    encoded = {}
+    source = image
+    for name in reversed(RUNGS):
+        width, quality = RUNGS[name]
+        # never upscale, a rung wider than the source gets the source size
+        if width is not None and width < source.shape[1]:
+            height = max(1, round(source.shape[0] * width / source.shape[1]))
+            source = cv2.resize(source, (width, height), interpolation=cv2.INTER_AREA)
+        _, jpeg = cv2.imencode('.jpg', source, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        encoded[name] = jpeg.tobytes()
+    return encoded
+
+
+class EncodedLadder:
+    """All rungs of one frame as EncodedFrame objects, stored as one frame cache entry"""
+
+    def __init__(self, encoded):
+        self.rungs = {name: EncodedFrame(jpeg) for name, jpeg in encoded.items()}
+        self.sizes = {name: len(jpeg) for name, jpeg in encoded.items()}
+
+    def __getitem__(self, rung):
+        return self.rungs[rung]
+
+
+def choose_rung(sizes, bandwidth, budget=FRAME_BUDGET):
+    """
+    Largest rung whose size downloads within budget at bandwidth (bytes/s),
+    DEFAULT_RUNG when nothing is known about the client
+    """
+    if bandwidth is None:
+        return DEFAULT_RUNG
+    chosen = next(iter(RUNGS))
+    for name in RUNGS:
+        if sizes[name] <= bandwidth * budget:
+            chosen = name
+    return chosen
+
+
+class BandwidthEstimator:
+    """
+    Exponentially weighted bytes/second per client, fed by the MJPEG and WebSocket
+    streams with the time each frame's send blocked. Once a client reads slower
+    than frames come, the server's write buffer fills and every send waits for it,
+    so that time follows the client's link. A send that returns at once (under
+    min_duration) only says the client keeps up, its rate is size / min_duration.
+    Keeps at most max_clients, least recently seen go first.
+    """
+
+    def __init__(self, alpha=0.3, max_clients=1024, min_duration=0.001):
+        self.alpha = alpha
+        self.max_clients = max_clients
+        self.min_duration = min_duration
+        self._rates = OrderedDict()  # client -> (bytes/s, monotonic time of the last update)
+        self._lock = threading.Lock()
+
+    def update(self, client, nbytes, seconds):
+        rate = nbytes / max(seconds, self.min_duration)
+        with self._lock:
+            previous = self._rates.pop(client, None)
+            if previous is not None:
+                rate = self.alpha * rate + (1 - self.alpha) * previous[0]
+            self._rates[client] = (rate, time.monotonic())
+            while len(self._rates) > self.max_clients:
+                self._rates.popitem(last=False)
+        return rate
+
+    def estimate(self, client):
+        entry = self._rates.get(client)
+        return entry[0] if entry is not None else None
@@ -0,0 +1,108 @@
+"""
+Log file tail reader and follower for the /logs endpoints
+"""
+import asyncio
+import logging
+import os
+import re
+
+# matches the level in log.ini's format: [2024-01-01 10:00:00,000.000] INFO [1234] - message
+LEVEL_RE = re.compile(r"\] (DEBUG|INFO|WARNING|ERROR|CRITICAL) \[")
+BLOCK_SIZE = 8192
+MAX_SCAN_BYTES = 4 * 1024 * 1024  # a level filter never reads more than this from the end
+
+
+def line_level(line):
+    """Numeric level of a log line, None for lines without one (tracebacks, prints)"""
+    match = LEVEL_RE.search(line)
+    return logging.getLevelName(match.group(1)) if match else None
+
+
+def level_filter(level):
+    """Predicate keeping lines at level or above, None keeps everything"""
+    if level is None:
+        return None
+    min_level = logging.getLevelName(level.upper())
+    if not isinstance(min_level, int):
+        raise ValueError(f"Unknown log level {level}")
+    return lambda line: (line_level(line) or 0) >= min_level
+
+
+def tail_lines(path, n=20, level=None):
+    """
+    Last n lines of path, oldest first, optionally only lines at level or above.
+
+    Reads blocks backwards from the end of the file, so the cost depends on n
+    and the line length, not on the file size.
+    """
+    keep = level_filter(level)
+    lines = []
+    with open(path, "rb") as file:
+        position = file.seek(0, os.SEEK_END)
+        scanned = 0
+        tail = b""
+        while position > 0 and len(lines) < n and scanned < MAX_SCAN_BYTES:
+            size = min(BLOCK_SIZE, position)
+            position -= size
+            file.seek(position)
+            chunk = file.read(size) + tail
+            scanned += size
+            parts = chunk.split(b"\n")
+            # the first part may be cut in the middle, keep it for the next block
+            tail = parts.pop(0) if position > 0 else b""
+            for raw in reversed(parts):
+                line = raw.decode("utf-8", errors="replace").rstrip("\r")
+                if line and (keep is None or keep(line)):
+                    lines.append(line)
+                    if len(lines) == n:
+                        break
+    lines.reverse()
+    return lines
+
+
+async def follow_lines(path, level=None, poll_interval=0.5):
+    """
+    Yields lines appended to path from now on. Reopens the file when it is
+    rotated or truncated.
+    """
+    keep = level_filter(level)
+    file = None
+    partial = ""
+    seek_end = True  # skip what is already there, but not in a file created later
+    try:
+        while True:
+            if file is None:
+                try:
+                    file = open(path, "r", encoding="utf-8", errors="replace")
+                    if seek_end:
+                        file.seek(0, os.SEEK_END)
+                    inode = os.fstat(file.fileno()).st_ino
+                except FileNotFoundError:
+                    seek_end = False
+                    await asyncio.sleep(poll_interval)
+                    continue
+            data = file.read()
+            if data:
+                lines = (partial + data).split("\n")
+                partial = lines.pop()
+                for line in lines:
+                    line = line.rstrip("\r")
+                    if line and (keep is None or keep(line)):
+                        yield line
+                continue
+            try:
+                stat = os.stat(path)
+                rotated = stat.st_ino != inode or stat.st_size < file.tell()
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                # a rotated log starts empty, read the new file from the beginning
+                file.close()
+                file = None
+                partial = ""
+                seek_end = False
+                continue
+            await asyncio.sleep(poll_interval)
+    finally:
+        if file is not None:
+            file.close()
@@ -1,28 +1,46 @@
 """
 Backend server for LIFESPECTRA
 """
-from fastapi import FastAPI, Request, HTTPException, Query, File
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
+from fastapi import FastAPI, Request, HTTPException, Query, WebSocket
+from fastapi.responses import FileResponse, RedirectResponse, JSONResponse, Response, StreamingResponse
 import pathlib
-from datetime import datetime
 import logging
 from colorlog import ColoredFormatter
 import cv2
 import uvicorn
 import os
-import base64
-from utils import *
-from collections import deque
+from utils import SCENE_PATH, get_ip, real_cam_move_by, real_cam_move_home
+from frame_cache import EncodedFrame
+from ladder import RUNGS, AUTO, EncodedLadder, BandwidthEstimator, choose_rung, encode_ladder
+from image_pool import ImageWorkerPool
+from rate_limit import retry_after_header
+from log_tail import tail_lines, follow_lines, level_filter
+from cameras import build_registry, seed_from_file
+from clip_buffer import ClipExporter, CLIP_FORMATS
+from movement import DIRECTIONS
+from overlay import draw_osd
+from tiles import TilePyramid
+from metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from streaming import WebSocketViewer, mjpeg_stream, MJPEG_BOUNDARY, MAX_STREAM_FPS
 import time
+import asyncio
 
 WP_PORT = "10004"
 WP_CAMERA_PAGE = "Camera1"
 cwd = pathlib.Path(__file__).parent.resolve()
+LOG_PATH = f"{cwd}/logfile.log"
 EMUL = True  # Set to True if emulating moving hardware
+IMAGE_PATH = "app/static/image.jpg"  # written by rgb_camera.py when it runs as a separate process
+SNAPSHOT = False  # Set to True to also write every published frame to IMAGE_PATH
+SMALL_JPEG_QUALITY = 1
+# camera_id=kind[:option],... see cameras.parse_cameras, the first camera also serves the unprefixed routes,
+# a synthetic camera for load tests is one of them, e.g. "main=emulator,synth=synthetic:bars:1920x1080@60"
+CAMERAS = os.environ.get("LIFESPECTRA_CAMERAS") or ("main=emulator" if EMUL else f"main=file:{IMAGE_PATH}")
+IMAGE_WORKERS = int(os.environ.get("LIFESPECTRA_IMAGE_WORKERS", 0)) or None  # None = one per CPU core
+# comma separated operator keys, a request sending one in x-api-key is limited per key instead of per IP
+API_KEYS = frozenset(key.strip() for key in os.environ.get("LIFESPECTRA_API_KEYS", "").split(",") if key.strip())
 
 app = FastAPI()
-rate_limit_window = 500  # milliseconds
-last_request_time = 0
 
 # Setup Logging Configuration
 log_format = '\033[34m%(asctime)s\033[0m - %(log_color)s%(levelname)s%(reset)s - %(message)s'
@@ -45,6 +63,26 @@ root_logger = logging.getLogger()
 root_logger.addHandler(log_handler)
 root_logger.setLevel(logging.INFO)
 
+# Request metrics, exported by /metrics
+metrics = Registry()
+requests_total = metrics.counter("lifespectra_http_requests_total", "HTTP requests by route and status",
+                                 ("method", "route", "status"))
+request_duration = metrics.histogram("lifespectra_http_request_duration_seconds",
+                                     "HTTP request latency, for streams the connection lifetime",
+                                     ("method", "route"))
+requests_in_flight = metrics.gauge("lifespectra_http_requests_in_flight", "HTTP requests being served")
+rate_limited_total = metrics.counter("lifespectra_rate_limited_total", "Requests rejected by the rate limiter",
+                                     ("route_class",))
+
+
+def route_label(scope):
+    """
+    Route template (e.g. /logs/stream) so the metric labels stay bounded
+    """
+    route = scope.get("route")
+    return getattr(route, "path", "<unmatched>")
+
+
 # Create FastAPI logging Middleware
 class LoggingMiddleware:
     def __init__(self, app):
@@ -52,46 +90,266 @@ class LoggingMiddleware:
 
     async def __call__(self, scope, receive, send):
         if scope['type'] == 'http':
-            start_time = datetime.now()
+            start_time = time.perf_counter()
+            status = 500
             async def send_wrapper(message):
+                nonlocal status
                 if message['type'] == 'http.response.start':
+                    status = message['status']
                     logging.info(f"{scope['method']} {scope['path']} - {message['status']}")
                 await send(message)
-            await self.app(scope, receive, send_wrapper)
-            end_time = datetime.now()
-            execution_time = (end_time - start_time).total_seconds()
+            requests_in_flight.inc()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                requests_in_flight.dec()
+                execution_time = time.perf_counter() - start_time
+                route = route_label(scope)
+                requests_total.inc(scope['method'], route, status)
+                request_duration.observe(execution_time, scope['method'], route)
             logging.info(f"{scope['method']} {scope['path']} - Completed in {execution_time} seconds")
         else:
             await self.app(scope, receive, send)
 
 # Add Logging Middleware
 app.add_middleware(LoggingMiddleware)
-print(f'IP address of backend server {get_ip()}')
-# Rate Limiting Middleware
+# Bytes/second each client has been reading its MJPEG/WebSocket streams at, picks the ladder rung for rung=auto
+bandwidth_estimator = BandwidthEstimator()
+
+
+def client_key(connection):
+    """
+    Rate limit identity of a request or WebSocket: API key if it is one of API_KEYS,
+    client IP otherwise, so made-up keys cannot open fresh buckets
+    """
+    api_key = connection.headers.get("x-api-key")
+    if api_key in API_KEYS:
+        return f"key:{api_key}"
+    return connection.client.host if connection.client else "unknown"
+
+
+# Rate Limiting Middleware, one token bucket per client, camera and route class (limits in rate_limit.DEFAULT_LIMITS)
 @app.middleware("http")
 async def rate_limiting_middleware(request: Request, call_next):
-    global last_request_time
-    current_time = time.time() * 1000  # convert to milliseconds
-    if request.url.components.path=="/iiimage_small":
-        if current_time - last_request_time < rate_limit_window:
-            #pass
-            logging.warning("Rate limit exceeded. Please try again later.")
-            return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded. Please try again later."})
-    last_request_time = current_time
+    client = client_key(request)
+    # /cameras/{camera_id}/image counts against that camera's /image bucket
+    camera, path = cameras.split_path(request.url.path)
+    if camera is None:
+        return await call_next(request)
+    allowed, retry_after, route_class = camera.rate_limiter.check(client, path)
+    if not allowed:
+        rate_limited_total.inc(route_class)
+        logging.warning(f"Rate limit exceeded for {client} on {route_class} routes of camera {camera.camera_id}.")
+        return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded. Please try again later."},
+                            headers={"Retry-After": retry_after_header(retry_after)})
     response = await call_next(request)
     return response
-# async def rate_limiting_middleware(request: Request, call_next):
-#     global last_request_time
-#     current_time = time.time() * 1000  # convert to milliseconds
-#     if current_time - last_request_time < rate_limit_window:
-#         raise HTTPException(status_code=429, detail="Too many requests, please try again later.")
-#     last_request_time = current_time
-#     response = await call_next(request)
-#     return response
-
-# Emulated Camera Controller
-if EMUL:
-    emul_camera_controller = CameraController()
+
+# Threads for cv2 and file work, the async handlers must not block the event loop
+image_pool = ImageWorkerPool(IMAGE_WORKERS)
+# Every camera has its own frame store, encoded frame cache (frames reused until the camera
+# publishes a new one), stream encoder, movement queue, rate limiter and worker thread
+cameras = build_registry(CAMERAS, image_pool)
+default_camera = cameras.default
+default_camera.image_path = IMAGE_PATH  # rgb_camera.py may be writing it from a separate process
+if not EMUL:
+    # the real rig, the other cameras have no hardware to move
+    default_camera.hardware_move = real_cam_move_by
+if SNAPSHOT:
+    default_camera.store.snapshot_path = IMAGE_PATH
+# The unprefixed routes serve the default camera
+frame_store = default_camera.store
+frame_cache = default_camera.cache
+stream_encoder = default_camera.encoder
+rate_limiter = default_camera.rate_limiter
+movement_queue = default_camera.movement
+# Clips of the pre-trigger buffers of rgb cameras, written on background threads
+clip_exporter = ClipExporter(os.environ.get("LIFESPECTRA_CLIP_DIR", f"{cwd}/clips"))
+
+
+# Nothing heavy happens at import: scenes, capture devices and sources are opened by
+# warm_up() after the server accepts connections, /health/ready tells when it is done
+startup_state = {"ready": False, "started": time.time(), "ready_after_s": None, "steps": {}}
+_warm_up_task = None
+
+
+def print_ip():
+    print(f'IP address of backend server {get_ip()}')
+
+
+def seed_default_camera():
+    if default_camera.emulated:
+        # show the last saved view until the emulated camera moves
+        seed_from_file(default_camera, IMAGE_PATH)
+
+
+async def warm_up():
+    """
+    Runs the startup steps one after the other on the image pool. A failed step is
+    logged and reported by /health/ready, the others still run.
+    """
+    steps = [("ip", print_ip), ("seed", seed_default_camera)]
+    for camera in cameras:
+        steps.append((f"camera:{camera.camera_id}", camera.warm_up))
+    start = time.perf_counter()
+    for name, step in steps:
+        step_start = time.perf_counter()
+        try:
+            await image_pool.run(step)
+        except Exception as error:
+            logging.exception(f"Startup step {name} failed")
+            startup_state["steps"][name] = {"state": "failed", "error": str(error)}
+        else:
+            startup_state["steps"][name] = {"state": "done",
+                                            "ms": round((time.perf_counter() - step_start) * 1000, 1)}
+    startup_state["ready_after_s"] = round(time.time() - startup_state["started"], 3)
+    startup_state["ready"] = True
+    logging.info(f"Backend ready, warm up took {time.perf_counter() - start:.3f} s")
+
+
+@app.on_event("startup")
+async def start_warm_up():
+    global _warm_up_task
+    _warm_up_task = asyncio.create_task(warm_up())
+
+
+@app.on_event("shutdown")
+async def stop_cameras():
+    if _warm_up_task is not None and not _warm_up_task.done():
+        _warm_up_task.cancel()
+    cameras.stop()
+    image_pool.shutdown()
+
+
+image_pool_gauge = metrics.gauge("lifespectra_image_pool", "Image worker pool state, see /image_pool", ("field",))
+frame_cache_gauge = metrics.gauge("lifespectra_frame_cache", "Encoded frame cache hits, misses and size", ("field",))
+source_gauge = metrics.gauge("lifespectra_camera_source", "Synthetic and replay camera frames produced, late, dropped",
+                             ("camera", "field"))
+camera_gauge = metrics.gauge("lifespectra_camera", "Frames published, cache and pending moves per camera",
+                             ("camera", "field"))
+
+
+def collect_metrics():
+    for field, value in image_pool.stats().items():
+        image_pool_gauge.set(value, field)
+    frame_cache_gauge.set(sum(camera.cache.hits for camera in cameras), "hits")
+    frame_cache_gauge.set(sum(camera.cache.misses for camera in cameras), "misses")
+    frame_cache_gauge.set(sum(len(camera.cache) for camera in cameras), "entries")
+    for camera in cameras:
+        camera_gauge.set(camera.store.seq, camera.camera_id, "seq")
+        camera_gauge.set(camera.cache.hits, camera.camera_id, "cache_hits")
+        camera_gauge.set(camera.cache.misses, camera.camera_id, "cache_misses")
+        camera_gauge.set(camera.movement.pending, camera.camera_id, "pending_moves")
+        if camera.source is not None:
+            for field, value in camera.source.stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    source_gauge.set(value, camera.camera_id, field)
+
+
+metrics.add_collector(collect_metrics)
+
+# Tiles of the emulator's scene, also served by /tiles/{z}/{x}/{y}
+scene_pyramid = TilePyramid(SCENE_PATH)
+
+# Emulated Camera Controller of the default camera
+emul_camera_controller = default_camera.controller
+
+
+def get_camera(camera_id):
+    try:
+        return cameras.get(camera_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown camera {camera_id}")
+
+
+_disk_frames = {}  # camera_id -> (mtime_ns, image) of its image_path
+
+
+def current_frame(camera=None):
+    """
+    (version, image) of the latest frame. Falls back to the JPEG on disk when the
+    camera is running in a separate process, the file is decoded only when it changes.
+    """
+    camera = camera or default_camera
+    frame = camera.store.latest()
+    if frame is not None:
+        return ("seq", frame.seq), frame.image
+    if camera.image_path is None:
+        return None, None
+    try:
+        mtime = os.stat(camera.image_path).st_mtime_ns
+    except FileNotFoundError:
+        return None, None
+    disk_frame = _disk_frames.get(camera.camera_id)
+    if disk_frame is None or disk_frame[0] != mtime:
+        disk_frame = _disk_frames[camera.camera_id] = (mtime, cv2.imread(camera.image_path))
+    return ("file", mtime), disk_frame[1]
+
+
+async def latest_frame(camera=None):
+    """
+    current_frame() for the async handlers, the disk fallback runs on the image pool
+    """
+    camera = camera or default_camera
+    frame = camera.store.latest()
+    if frame is not None and frame.rendered:
+        return ("seq", frame.seq), frame.image
+    # renders a lazily published frame or reads the disk fallback
+    return await image_pool.run(current_frame, camera)
+
+
+_renders_in_flight = {}  # (camera_id, cache key) -> task rendering it
+
+
+async def cached_render(key, render, entry_type=EncodedFrame, camera=None):
+    """
+    Encoded frame for key from the camera's cache, rendered on the image pool on a miss.
+    Concurrent misses of the same key wait for a single render.
+    """
+    camera = camera or default_camera
+    encoded = camera.cache.get(key)
+    if encoded is not None:
+        return encoded
+    flight_key = (camera.camera_id, key)
+    task = _renders_in_flight.get(flight_key)
+    if task is None:
+        task = asyncio.ensure_future(image_pool.run(camera.cache.get_or_create, key, render, entry_type))
+        _renders_in_flight[flight_key] = task
+        task.add_done_callback(lambda _: _renders_in_flight.pop(flight_key, None))
+    return await asyncio.shield(task)
+
+
+def check_rung(rung):
+    if rung is not None and rung != AUTO and rung not in RUNGS:
+        raise HTTPException(status_code=400, detail=f"Unknown rung {rung}, use one of {list(RUNGS) + [AUTO]}")
+
+
+async def ladder_rung(request, version, image, rung, camera=None):
+    """
+    EncodedFrame of one rung of the encode ladder, all rungs are encoded together
+    once per frame. rung=auto picks the largest rung the client has been fast enough
+    for on its streams. A single response says nothing about the client: the server
+    hands it to the socket buffer and is done, long before the client has read it.
+    Without a stream from that client auto gives DEFAULT_RUNG.
+    """
+    ladder = await cached_render((version, "ladder"), lambda: encode_ladder(image), EncodedLadder, camera)
+    if rung == AUTO:
+        rung = choose_rung(ladder.sizes, bandwidth_estimator.estimate(client_key(request)))
+    return ladder[rung]
+
+
+def encode_jpeg(image, quality=None):
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if quality is not None else []
+    _, encoded_image = cv2.imencode('.jpg', image, params)
+    return encoded_image.tobytes()
+
+
+def render_small(image, quality=None):
+    # Resize the image to 320x240
+    resized_image = cv2.resize(image, (320, 240))
+    # the resized image is a new array, draw the OSD on it without another copy
+    draw_osd(resized_image, 100, 100, 100, 100, "small")
+    return encode_jpeg(resized_image, quality)
 
 @app.get("/delete_requests")
 async def clear_requests():
@@ -108,49 +366,114 @@ async def camera_home():
     real_cam_move_home()
     return RedirectResponse(f"http://localhost:{WP_PORT}/{WP_CAMERA_PAGE}/")
 
-@app.get("/camera_up")
-async def camera_up(param: str = Query(None)):
-    if EMUL:
-        emul_camera_controller.move_up()
-    else:
-        real_cam_move_up()
+async def move_camera(camera, direction, param=None):
+    """
+    Queues one step of camera in direction, bursts are merged into one move
+    """
+    if not camera.movable:
+        raise HTTPException(status_code=400, detail=f"Camera {camera.camera_id} ({camera.kind}) cannot move")
+    command_id = camera.movement.submit(direction)
     if param is not None:
-        return {"message": "OK"}
+        return {"message": "OK", "command_id": command_id}
     else:
         return RedirectResponse(f"http://localhost:{WP_PORT}/{WP_CAMERA_PAGE}/")
 
+@app.get("/camera_up")
+async def camera_up(param: str = Query(None)):
+    return await move_camera(default_camera, "up", param)
+
 @app.get("/camera_down")
 async def camera_down(param: str = Query(None)):
-    if EMUL:
-        emul_camera_controller.move_down()
-    else:
-        real_cam_move_down()
-    if param is not None:
-        return {"message": "OK"}
-    else:
-        return RedirectResponse(f"http://localhost:{WP_PORT}/{WP_CAMERA_PAGE}/")
+    return await move_camera(default_camera, "down", param)
 
 @app.get("/camera_left")
 async def camera_left(param: str = Query(None)):
-    if EMUL:
-        emul_camera_controller.move_left()
-    else:
-        real_cam_move_left()
-    if param is not None:
-        return {"message": "OK"}
-    else:
-        return RedirectResponse(f"http://localhost:{WP_PORT}/{WP_CAMERA_PAGE}/")
+    return await move_camera(default_camera, "left", param)
 
 @app.get("/camera_right")
 async def camera_right(param: str = Query(None)):
-    if EMUL:
-        emul_camera_controller.move_right()
-    else:
-        real_cam_move_right()
-    if param is not None:
-        return {"message": "OK"}
-    else:
-        return  RedirectResponse(f"http://localhost:{WP_PORT}/{WP_CAMERA_PAGE}/")
+    return await move_camera(default_camera, "right", param)
+
+
+async def goto_camera(camera, x, y, zoom):
+    if not camera.emulated:
+        raise HTTPException(status_code=400, detail="Absolute positioning is only available in emulation")
+    state = await camera.run(camera.controller.goto, x, y, zoom)
+    return {"message": "OK", "x": state.x, "y": state.y, "zoom": state.zoom}
+
+
+async def zoom_camera(camera, factor):
+    if not camera.emulated:
+        raise HTTPException(status_code=400, detail="Zoom is only available in emulation")
+    state = await camera.run(camera.controller.zoom_by, factor)
+    return {"message": "OK", "x": state.x, "y": state.y, "zoom": state.zoom}
+
+
+def command_status(camera, command_id):
+    status = camera.movement.status(command_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown command id")
+    return status
+
+
+@app.get("/camera_goto")
+async def camera_goto(x: float, y: float, zoom: float = Query(None, gt=0)):
+    """
+    Absolute position of the emulated camera, top-left in scene pixels, zoom > 1 zooms in
+    """
+    return await goto_camera(default_camera, x, y, zoom)
+
+
+@app.get("/camera_zoom")
+async def camera_zoom(factor: float = Query(..., gt=0)):
+    return await zoom_camera(default_camera, factor)
+
+
+@app.get("/camera_command/{command_id}")
+async def camera_command(command_id: int):
+    """
+    State of a queued movement command: queued, running, done or failed
+    """
+    return command_status(default_camera, command_id)
+
+
+@app.get("/cameras")
+async def list_cameras():
+    """
+    Registered cameras, the first one also serves the routes without /cameras/{camera_id}
+    """
+    return {"default": default_camera.camera_id, "cameras": [camera.info() for camera in cameras]}
+
+
+@app.get("/cameras/{camera_id}")
+async def camera_info(camera_id: str):
+    return get_camera(camera_id).info()
+
+
+@app.get("/cameras/{camera_id}/camera_goto")
+async def camera_goto_by_id(camera_id: str, x: float, y: float, zoom: float = Query(None, gt=0)):
+    return await goto_camera(get_camera(camera_id), x, y, zoom)
+
+
+@app.get("/cameras/{camera_id}/camera_zoom")
+async def camera_zoom_by_id(camera_id: str, factor: float = Query(..., gt=0)):
+    return await zoom_camera(get_camera(camera_id), factor)
+
+
+@app.get("/cameras/{camera_id}/camera_command/{command_id}")
+async def camera_command_by_id(camera_id: str, command_id: int):
+    return command_status(get_camera(camera_id), command_id)
+
+
+@app.get("/cameras/{camera_id}/camera_{direction}")
+async def camera_move_by_id(camera_id: str, direction: str, param: str = Query(None)):
+    """
+    /cameras/{camera_id}/camera_up|down|left|right
+    """
+    camera = get_camera(camera_id)
+    if direction not in DIRECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown direction {direction}")
+    return await move_camera(camera, direction, param)
 
 
 @app.get("/dummy")
@@ -165,59 +488,298 @@ async def read_root():
 async def health_check():
     return "Server OK", 200
 
+@app.get('/health/live')
+async def liveness():
+    """
+    The process serves requests, says nothing about cameras
+    """
+    return {"live": True}
+
+@app.get('/health/ready')
+async def readiness():
+    """
+    200 once the startup steps ran, 503 before. Failed steps make the backend ready but degraded.
+    """
+    failed = [name for name, step in startup_state["steps"].items() if step["state"] == "failed"]
+    content = dict(startup_state, degraded=bool(failed))
+    return JSONResponse(content=content, status_code=200 if startup_state["ready"] else 503)
+
+@app.get('/metrics')
+async def read_metrics():
+    """
+    Prometheus text format
+    """
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get('/image_pool')
+async def image_pool_stats():
+    """
+    Queue depth and timings of the image worker threads
+    """
+    return image_pool.stats()
+
+async def serve_image_small(camera, request, rung):
+    check_rung(rung)
+    version, image = await latest_frame(camera)
+    if image is None:
+        return JSONResponse(content={"error": "Image not found"}, status_code=404)
+    if rung is not None:
+        encoded = await ladder_rung(request, version, image, rung, camera)
+        return Response(content=encoded.jpeg, media_type="image/jpeg")
+    encoded = await cached_render((version, "small", SMALL_JPEG_QUALITY),
+                                  lambda: render_small(image, SMALL_JPEG_QUALITY), camera=camera)
+    return Response(content=encoded.jpeg, media_type="image/jpeg")
+
+
+async def serve_image(camera, request, rung):
+    check_rung(rung)
+    version, image = await latest_frame(camera)
+    if image is None:
+        return JSONResponse(content={"error": "Image not found"}, status_code=404)
+    if rung is not None:
+        encoded = await ladder_rung(request, version, image, rung, camera)
+    elif version[0] == "file":
+        encoded = await cached_render((version, "full"), lambda: pathlib.Path(camera.image_path).read_bytes(),
+                                      camera=camera)
+    else:
+        encoded = await cached_render((version, "full"), lambda: encode_jpeg(image), camera=camera)
+    return Response(content=encoded.jpeg, media_type="image/jpeg")
+
+
+async def serve_image64(camera, request, rung):
+    check_rung(rung)
+    version, image = await latest_frame(camera)
+    if image is not None:
+        if rung is not None:
+            encoded = await ladder_rung(request, version, image, rung, camera)
+        else:
+            encoded = await cached_render((version, "small", None), lambda: render_small(image), camera=camera)
+
+        # Return the base64 image as JSON
+        return JSONResponse(content={"image_base64": encoded.base64})
+    else:
+        return JSONResponse(content={"error": "Image not found"}, status_code=404)
+
+
+def serve_stream(camera, request, fps, width, height, quality, rung):
+    check_rung(rung)
+    client = client_key(request)
+    return StreamingResponse(mjpeg_stream(camera.store, camera.encoder, fps, width, height, quality,
+                                          rung, bandwidth_estimator, client),
+                             media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}",
+                             headers={"Cache-Control": "no-cache"})
+
+
+def stream_status(client, camera=None):
+    """
+    Small status dict pushed to WebSocket viewers next to the frames
+    """
+    camera = camera or default_camera
+    status = {"camera_id": camera.camera_id, "rate_limit": camera.rate_limiter.state(client)}
+    if camera.emulated:
+        status["position"] = list(camera.controller.current_position)
+    return status
+
+
+async def serve_websocket(camera, websocket, fps, width, height, quality, rung):
+    if rung is not None and rung != AUTO and rung not in RUNGS:
+        await websocket.close(code=1008, reason=f"Unknown rung {rung}")
+        return
+    client = client_key(websocket)
+    allowed, retry_after, _ = camera.rate_limiter.check(client, "/stream")
+    if not allowed:
+        rate_limited_total.inc("frames")
+        await websocket.close(code=1013, reason=f"Rate limit exceeded, retry after {retry_after_header(retry_after)} s")
+        return
+    await websocket.accept()
+    viewer = WebSocketViewer(websocket, camera.store, camera.encoder, lambda: stream_status(client, camera),
+                             fps, width, height, quality, rung, bandwidth_estimator, client)
+    await viewer.run()
+    logging.info(f"WebSocket viewer of {camera.camera_id} closed, sent {viewer.sent} frames, skipped {viewer.skipped}")
+
+
+@app.get("/cameras/{camera_id}/clip")
+async def export_clip(camera_id: str, seconds: float = Query(None, gt=0), format: str = Query("avi")):
+    """
+    Writes the last seconds (the whole buffer by default) of an rgb camera to a clip,
+    returns at once, poll /clips/{clip_id}
+    """
+    camera = get_camera(camera_id)
+    if camera.ring is None:
+        raise HTTPException(status_code=400, detail=f"Camera {camera_id} has no pre-trigger buffer")
+    if format not in CLIP_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown clip format {format}, use one of {CLIP_FORMATS}")
+    try:
+        clip_id = clip_exporter.export(camera.ring, seconds, format, camera_id)
+    except ValueError as error:
+        raise HTTPException(status_code=409, detail=str(error))
+    return {"message": "OK", "clip_id": clip_id}
+
+
+@app.get("/cameras/{camera_id}/replay")
+async def control_replay(camera_id: str, seek: float = Query(None, ge=0), speed: float = Query(None, gt=0, le=64)):
+    """
+    Seek (seconds into the file) and speed of a replay camera, returns its state
+    """
+    camera = get_camera(camera_id)
+    if camera.kind != "replay":
+        raise HTTPException(status_code=400, detail=f"Camera {camera_id} is not a replay camera")
+    if not camera.source.running:
+        raise HTTPException(status_code=503, detail=f"Replay camera {camera_id} is not running yet")
+    if speed is not None:
+        camera.source.set_speed(speed)
+    if seek is not None:
+        camera.source.seek(seek)
+    return camera.source.stats()
+
+
+@app.get("/clips/{clip_id}")
+async def clip_status(clip_id: int):
+    """
+    State of a clip export: queued, writing, done or failed
+    """
+    status = clip_exporter.status(clip_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown clip id")
+    return status
+
+
+@app.get("/clips/{clip_id}/file")
+async def clip_file(clip_id: int):
+    status = clip_exporter.status(clip_id)
+    if status is None or status["state"] != "done":
+        raise HTTPException(status_code=404, detail="Clip not ready")
+    media_type = "video/x-msvideo" if status["format"] == "avi" else "video/x-motion-jpeg"
+    return FileResponse(status["path"], media_type=media_type, filename=os.path.basename(status["path"]))
+
+
 @app.get("/image_small")
-async def get_image():
-    image_path = "app/static/image.jpg"
-    if os.path.exists(image_path):
-        # Read the image
-        image = cv2.imread(image_path)
-
-        # Resize the image to 320x240
-        resized_image = cv2.resize(image, (320, 240))
-        resized_image = generate_osd_frame(resized_image, 100, 100, 100, 100, "small")
-        # Encode the resized image as base64
-        _, encoded_image = cv2.imencode('.jpg', resized_image)
-        cv2.imwrite("app/static/image_small.jpg", resized_image,[cv2.IMWRITE_JPEG_QUALITY, 1])
-    return FileResponse("app/static/image_small.jpg")
+async def get_image_small(request: Request, rung: str = Query(None)):
+    """
+    320x240 JPEG with the OSD, rung=thumb|small|medium|full|auto serves a rung of the encode ladder instead
+    """
+    return await serve_image_small(default_camera, request, rung)
 @app.get("/image")
-async def get_image():
-    return FileResponse("app/static/image.jpg")
+async def get_image(request: Request, rung: str = Query(None)):
+    return await serve_image(default_camera, request, rung)
+@app.get("/stream")
+async def stream(request: Request,
+                 fps: int = Query(10, ge=1, le=MAX_STREAM_FPS),
+                 width: int = Query(None, ge=16, le=4096),
+                 height: int = Query(None, ge=16, le=4096),
+                 quality: int = Query(80, ge=1, le=100),
+                 rung: str = Query(None)):
+    """
+    MJPEG live view, use as <img src="/stream?fps=10&width=320"> or <img src="/stream?rung=auto">
+    """
+    return serve_stream(default_camera, request, fps, width, height, quality, rung)
+@app.websocket("/ws")
+async def websocket_stream(websocket: WebSocket,
+                           fps: int = Query(10, ge=1, le=MAX_STREAM_FPS),
+                           width: int = Query(None, ge=16, le=4096),
+                           height: int = Query(None, ge=16, le=4096),
+                           quality: int = Query(80, ge=1, le=100),
+                           rung: str = Query(None)):
+    """
+    Binary JPEG frames plus JSON status text messages
+    """
+    await serve_websocket(default_camera, websocket, fps, width, height, quality, rung)
+
+
+@app.get("/cameras/{camera_id}/image_small")
+async def get_camera_image_small(camera_id: str, request: Request, rung: str = Query(None)):
+    return await serve_image_small(get_camera(camera_id), request, rung)
+
+
+@app.get("/cameras/{camera_id}/image")
+async def get_camera_image(camera_id: str, request: Request, rung: str = Query(None)):
+    return await serve_image(get_camera(camera_id), request, rung)
+
+
+@app.get("/cameras/{camera_id}/image64")
+async def get_camera_image64(camera_id: str, request: Request, rung: str = Query(None)):
+    return await serve_image64(get_camera(camera_id), request, rung)
+
+
+@app.get("/cameras/{camera_id}/stream")
+async def camera_stream(camera_id: str, request: Request,
+                        fps: int = Query(10, ge=1, le=MAX_STREAM_FPS),
+                        width: int = Query(None, ge=16, le=4096),
+                        height: int = Query(None, ge=16, le=4096),
+                        quality: int = Query(80, ge=1, le=100),
+                        rung: str = Query(None)):
+    return serve_stream(get_camera(camera_id), request, fps, width, height, quality, rung)
+
+
+@app.websocket("/cameras/{camera_id}/ws")
+async def camera_websocket_stream(websocket: WebSocket, camera_id: str,
+                                  fps: int = Query(10, ge=1, le=MAX_STREAM_FPS),
+                                  width: int = Query(None, ge=16, le=4096),
+                                  height: int = Query(None, ge=16, le=4096),
+                                  quality: int = Query(80, ge=1, le=100),
+                                  rung: str = Query(None)):
+    try:
+        camera = cameras.get(camera_id)
+    except KeyError:
+        await websocket.close(code=1008, reason=f"Unknown camera {camera_id}")
+        return
+    await serve_websocket(camera, websocket, fps, width, height, quality, rung)
+@app.get("/tiles")
+async def tiles_info():
+    """
+    Size and zoom levels of the scene pyramid, builds it on first use
+    """
+    try:
+        return await image_pool.run(scene_pyramid.ensure_built)
+    except FileNotFoundError as error:
+        return JSONResponse(content={"error": str(error)}, status_code=404)
+@app.get("/tiles/{z}/{x}/{y}")
+async def get_tile(z: int, x: int, y: int):
+    try:
+        await image_pool.run(scene_pyramid.ensure_built)
+        tile = await image_pool.run(scene_pyramid.tile_bytes, z, x, y)
+    except (KeyError, FileNotFoundError) as error:
+        return JSONResponse(content={"error": str(error)}, status_code=404)
+    media_type = "image/jpeg" if scene_pyramid.ext == ".jpg" else "image/png"
+    return Response(content=tile, media_type=media_type, headers={"Cache-Control": "max-age=3600"})
 @app.get("/logs")
-async def read_last_logs():
+async def read_last_logs(n: int = Query(20, ge=1, le=1000), level: str = Query(None)):
+    """
+    Last n log lines, newest first, level=WARNING keeps WARNING and above
+    """
     try:
-        with open(f"{cwd}/logfile.log", "r") as file:
-            lines = file.readlines()
-            last_5_logs = lines[-20:]
-            # Reverse the array using slicing
-            last_5_logs = last_5_logs[::-1]
-            return {"last_logs": last_5_logs}
+        last_logs = await image_pool.run(tail_lines, LOG_PATH, n, level)
     except FileNotFoundError:
         return {"error": "Log file not found."}
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    # Reverse the array using slicing
+    return {"last_logs": last_logs[::-1]}
+@app.get("/logs/stream")
+async def stream_logs(level: str = Query(None)):
+    """
+    Server-Sent Events with new log lines as they are written
+    """
+    try:
+        level_filter(level)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
 
+    async def events():
+        async for line in follow_lines(LOG_PATH, level):
+            yield f"data: {line}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 @app.get("/image64")
-async def get_image():
+async def get_image64(request: Request, rung: str = Query(None)):
     """
     base64 encoded string
     """
-    image_path = "app/static/image.jpg"
-    if os.path.exists(image_path):
-        # Read the image
-        image = cv2.imread(image_path)
-
-        # Resize the image to 320x240
-        resized_image = cv2.resize(image, (320, 240))
-        resized_image = generate_osd_frame(resized_image, 100, 100, 100, 100, "small")
-        # Encode the resized image as base64
-        _, encoded_image = cv2.imencode('.jpg', resized_image)
-        image_base64 = base64.b64encode(encoded_image).decode("utf-8")
-
-        # Return the base64 image as JSON
-        return JSONResponse(content={"image_base64": image_base64})
-    else:
-        return JSONResponse(content={"error": "Image not found"}, status_code=404)
+    return await serve_image64(default_camera, request, rung)
 
 if __name__ == '__main__':
 
-    uvicorn.run(app, port=80, host='0.0.0.0', log_config=f"log.ini")
+    uvicorn.run(app, port=80, host='0.0.0.0', log_config="log.ini")
 
 
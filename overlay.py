@@ -0,0 +1,137 @@
+"""
+Overlay renderer: blur outside the region of interest and draw the OSD in one pass
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+BLUR_KSIZE = 21
+OSD_TEXT_POSITION = (50, 50)
+OSD_FONT = cv2.FONT_HERSHEY_SIMPLEX
+OSD_TEXT_COLOR = (255, 255, 255)  # White color
+OSD_BORDER_COLOR = (0, 0, 255)  # Red color
+OSD_THICKNESS = 2
+
+
+def draw_osd(frame, x, y, w, h, text):
+    """generate_osd_frame() without the copy, draws into frame"""
+    if text:
+        cv2.putText(frame, text, OSD_TEXT_POSITION, OSD_FONT, 1, OSD_TEXT_COLOR, OSD_THICKNESS)
+    cv2.rectangle(frame, (x, y), (x + w, y + h), OSD_BORDER_COLOR, OSD_THICKNESS)
+    return frame
+
+
+class _Layout:
+    """
+    Strips of the frame outside the ROI, each with the source window it is
+    blurred from (the strip plus the blur radius, clipped to the frame) so the
+    result matches a full-frame cv2.blur exactly
+    """
+
+    def __init__(self, shape, x, y, w, h, ksize):
+        height, width = shape[:2]
+        radius = ksize // 2
+        # the filled mask rectangle of blur_outside_rectangle includes x + w and y + h
+        left, top = min(max(x, 0), width), min(max(y, 0), height)
+        right, bottom = min(max(x + w + 1, 0), width), min(max(y + h + 1, 0), height)
+        if right <= left or bottom <= top:
+            left = right = top = bottom = 0
+        self.roi = (slice(top, bottom), slice(left, right))
+        strips = [
+            (0, top, 0, width),  # above
+            (bottom, height, 0, width),  # below
+            (top, bottom, 0, left),  # left
+            (top, bottom, right, width),  # right
+        ]
+        self.strips = []
+        for y0, y1, x0, x1 in strips:
+            if y1 <= y0 or x1 <= x0:
+                continue
+            sy0, sy1 = max(y0 - radius, 0), min(y1 + radius, height)
+            sx0, sx1 = max(x0 - radius, 0), min(x1 + radius, width)
+            self.strips.append((
+                (slice(y0, y1), slice(x0, x1)),  # destination in the frame
+                (slice(sy0, sy1), slice(sx0, sx1)),  # blur source window
+                (slice(y0 - sy0, y1 - sy0), slice(x0 - sx0, x1 - sx0)),  # strip inside the window
+            ))
+
+
+class OverlayRenderer:
+    """
+    Renders blur_outside_rectangle() + generate_osd_frame() with one output
+    allocation instead of a mask, a blurred copy, three bitwise results and
+    the OSD copy. Only the pixels outside the ROI are blurred, the strip
+    layout for every frame size and ROI is computed once and cached, and so
+    are the scratch buffers (per thread, renderers are shared by pool workers).
+
+    Pass out= to render into a buffer you own. Without it a new array is
+    returned, which is safe to publish to a FrameStore.
+    """
+
+    def __init__(self, ksize=BLUR_KSIZE):
+        self.ksize = ksize
+        self._layouts = {}
+        self._local = threading.local()
+
+    def _layout(self, shape, x, y, w, h):
+        key = (shape, x, y, w, h)
+        layout = self._layouts.get(key)
+        if layout is None:
+            layout = self._layouts[key] = _Layout(shape, x, y, w, h, self.ksize)
+        return layout
+
+    def _scratch(self, shape, dtype):
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        buffer = buffers.get((shape, dtype))
+        if buffer is None:
+            buffer = buffers[(shape, dtype)] = np.empty(shape, dtype)
+        return buffer
+
+    def blur_outside(self, frame, x, y, w, h, out=None):
+        if out is None:
+            out = np.empty_like(frame)
+        layout = self._layout(frame.shape, x, y, w, h)
+        out[layout.roi] = frame[layout.roi]
+        for destination, window, strip in layout.strips:
+            source = frame[window]
+            blurred = self._scratch(source.shape, source.dtype)
+            cv2.blur(source, (self.ksize, self.ksize), dst=blurred)
+            out[destination] = blurred[strip]
+        return out
+
+    def render(self, frame, x, y, w, h, text="", out=None):
+        out = self.blur_outside(frame, x, y, w, h, out)
+        return draw_osd(out, x, y, w, h, text)
+
+
+def _benchmark(repeats=50):
+    """python overlay.py: old blur + OSD functions vs OverlayRenderer"""
+    from utils import blur_outside_rectangle, generate_osd_frame
+    renderer = OverlayRenderer()
+    x, y, w, h = 100, 100, 400, 300
+    for width, height in ((640, 480), (1920, 1080)):
+        frame = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+        expected = generate_osd_frame(blur_outside_rectangle(frame, x, y, w, h), x, y, w, h, "")
+        assert np.array_equal(renderer.render(frame, x, y, w, h), expected)
+        out = np.empty_like(frame)
+        timings = {}
+        for name, render in (
+                ("functions", lambda: generate_osd_frame(blur_outside_rectangle(frame, x, y, w, h), x, y, w, h, "")),
+                ("renderer", lambda: renderer.render(frame, x, y, w, h)),
+                ("renderer out=", lambda: renderer.render(frame, x, y, w, h, out=out))):
+            render()
+            start = time.perf_counter()
+            for _ in range(repeats):
+                render()
+            timings[name] = (time.perf_counter() - start) / repeats * 1000
+        base = timings["functions"]
+        print(f"{width}x{height}: " + ", ".join(
+            f"{name} {ms:.2f} ms (x{base / ms:.1f})" for name, ms in timings.items()))
+
+
+if __name__ == "__main__":
+    _benchmark()
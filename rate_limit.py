@@ -0,0 +1,135 @@
+"""
+Per-client token-bucket rate limiting for the backend routes
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+
+# route class -> (tokens per second, burst size)
+DEFAULT_LIMITS = {
+    "frames": (10.0, 20),
+    "movement": (20.0, 40),
+    "logs": (2.0, 5),
+    "tiles": (50.0, 100),
+    "clips": (0.2, 2),
+}
+
+# path pattern (fnmatch) -> route class, paths not listed are not limited
+DEFAULT_ROUTES = {
+    "/image": "frames",
+    "/image_small": "frames",
+    "/image64": "frames",
+    "/stream": "frames",
+    "/camera_*": "movement",
+    "/logs": "logs",
+    "/logs/stream": "logs",
+    "/tiles/*": "tiles",
+    "/clip": "clips",
+}
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now):
+        """(allowed, seconds until a token is available)"""
+        self.refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True, 0.0
+        return False, (1.0 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    One token bucket per (client, route class). The caller picks the client key
+    (main.client_key: a configured API key, otherwise the IP), so operators do not
+    throttle each other.
+
+    Buckets live in memory. Buckets idle for longer than idle_timeout are dropped,
+    and at most max_buckets are kept (least recently used go first).
+    """
+
+    def __init__(self, limits=None, routes=None, max_buckets=4096, idle_timeout=600.0):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+        self.max_buckets = max_buckets
+        self.idle_timeout = idle_timeout
+        self.rejected = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def route_class(self, path):
+        for pattern, route_class in self.routes.items():
+            if fnmatchcase(path, pattern):
+                return route_class
+        return None
+
+    def check(self, client, path):
+        """
+        (allowed, retry_after seconds, route class) for one request of client to path
+        """
+        route_class = self.route_class(path)
+        if route_class is None or route_class not in self.limits:
+            return True, 0.0, route_class
+        now = time.monotonic()
+        key = (client, route_class)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate, burst = self.limits[route_class]
+                bucket = self._buckets[key] = TokenBucket(rate, burst, now)
+            else:
+                self._buckets.move_to_end(key)
+            allowed, retry_after = bucket.take(now)
+            if not allowed:
+                self.rejected += 1
+            self._evict(now)
+        return allowed, retry_after, route_class
+
+    def _evict(self, now):
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        if now - self._last_sweep < self.idle_timeout / 10:
+            return
+        self._last_sweep = now
+        # least recently used first, stop at the first bucket still in use
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket.updated < self.idle_timeout:
+                break
+            del self._buckets[key]
+
+    def state(self, client):
+        """Tokens left per route class for client, full buckets for unknown classes"""
+        now = time.monotonic()
+        state = {}
+        with self._lock:
+            for route_class, (rate, burst) in self.limits.items():
+                bucket = self._buckets.get((client, route_class))
+                if bucket is None:
+                    tokens = float(burst)
+                else:
+                    tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+                state[route_class] = {"tokens": round(tokens, 2), "burst": burst, "limited": tokens < 1.0}
+        return state
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+def retry_after_header(retry_after):
+    return str(max(1, math.ceil(retry_after)))
@@ -1,83 +1,184 @@
 import cv2
+import logging
+import threading
 import time
-import numpy as np
+from frame_store import FrameStore
+from overlay import OverlayRenderer
+
+
+class CaptureStats:
+    """
+    Counters and per-stage times of one capture, shown by the backend for rgb cameras.
+    grabbed/superseded count camera frames (superseded: replaced by a newer one
+    before processing took it), late/dropped count slots of the publish schedule.
+    """
+
+    def __init__(self):
+        self.grabbed = 0
+        self.superseded = 0
+        self.processed = 0
+        self.repeated = 0
+        self.late = 0
+        self.dropped = 0
+        self.grab_time = 0.0
+        self.ring_time = 0.0
+        self.process_time = 0.0
+        self.publish_time = 0.0
+        self.frame_age = 0.0  # grab to publish, summed over processed frames
+
+    def as_dict(self):
+        grabbed = max(self.grabbed, 1)
+        processed = max(self.processed, 1)
+        return {
+            "grabbed": self.grabbed,
+            "superseded": self.superseded,
+            "processed": self.processed,
+            "repeated": self.repeated,
+            "late": self.late,
+            "dropped": self.dropped,
+            "avg_grab_ms": round(self.grab_time / grabbed * 1000, 3),
+            "avg_ring_ms": round(self.ring_time / grabbed * 1000, 3),
+            "avg_process_ms": round(self.process_time / processed * 1000, 3),
+            "avg_publish_ms": round(self.publish_time / processed * 1000, 3),
+            "avg_frame_age_ms": round(self.frame_age / processed * 1000, 3),
+        }
+
+
+class FrameGrabber:
+    """
+    Reads the camera as fast as it delivers on its own thread and keeps only the
+    newest frame, so OpenCV's capture buffer never holds stale frames and the
+    processing stage always gets the current one. Every frame also goes to ring if given.
+    """
+
+    def __init__(self, camera, ring=None, stats=None):
+        self.camera = camera
+        self.ring = ring
+        self.stats = stats if stats is not None else CaptureStats()
+        self.running = False
+        self._frame = None  # (seq, image, monotonic grab time)
+        self._seq = 0
+        self._taken = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rgb-grabber", daemon=True)
+
+    def start(self):
+        self.running = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                ret, frame = self.camera.read()
+                grabbed = time.perf_counter()
+                if not ret:
+                    print("Error: Failed to capture frame")
+                    break
+                self.stats.grab_time += grabbed - start
+                self.stats.grabbed += 1
+                with self._cond:
+                    self._seq += 1
+                    if self._frame is not None and self._frame[0] > self._taken:
+                        self.stats.superseded += 1
+                    self._frame = (self._seq, frame, time.monotonic())
+                    self._cond.notify_all()
+                if self.ring is not None:
+                    self.ring.add_image(frame)
+                    self.stats.ring_time += time.perf_counter() - grabbed
+        finally:
+            with self._cond:
+                self.running = False
+                self._cond.notify_all()
+
+    def wait(self, after_seq=0, timeout=None):
+        """(seq, image, grab time) of the newest frame after after_seq, None on timeout or when grabbing stopped"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq or not self.running, timeout)
+            if self._seq <= after_seq:
+                return None
+            self._taken = self._seq
+            return self._frame
+
 
 """
 save frame every (duration) seconds , stand alone parallel process for normal functioning
+When a FrameStore is passed (camera running inside the backend) frames are published
+to it and file_name is only used as an optional disk snapshot, None disables it.
+Setting the stop event (threading.Event) ends the loop, device is the cv2 camera index.
+With a ring (clip_buffer.FrameRing) every frame the camera delivers is kept there for
+clip export, at the camera's full rate.
+
+A FrameGrabber thread reads the camera, this loop processes and publishes its newest
+frame once per duration on a fixed grid of a monotonic clock, so the period does not
+grow by the processing time. A slot missed entirely is skipped and counted as dropped.
 """
-def capture_and_save_photos(file_name, duration):
+def capture_and_save_photos(file_name, duration, store=None, stop=None, device=0, ring=None, stats=None):
+    if store is None:
+        store = FrameStore(snapshot_path=file_name)
+    elif file_name is not None:
+        store.snapshot_path = file_name
+    if stop is None:
+        stop = threading.Event()
+    stats = stats if stats is not None else CaptureStats()
+    renderer = OverlayRenderer()
     # Initialize the camera
-    camera = cv2.VideoCapture(0)
+    camera = cv2.VideoCapture(device)
+    # the grabber keeps up with the camera, a deeper driver queue only adds latency
+    camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    grabber = FrameGrabber(camera, ring, stats).start()
 
-    start_time = time.time()
+    last_seq = 0
+    next_time = time.monotonic()
 
     try:
-        while True:
-            # Capture frame-by-frame
-            ret, frame = camera.read()
-
-            if ret:
-                x, y, w, h = 100, 100, 400, 300
-
-                frame = blur_outside_rectangle(frame, x, y, w, h)
-                frame = generate_osd_frame(frame, x, y, w, h, "")
-
-
-                # Save the frame as a JPEG file
-
-                cv2.imwrite(file_name, frame)
-
-                print(f"Photos captured and saved to '{file_name}'")
-                print(time.time_ns())
-                # Wait for 1 second before capturing the next photo
-                time.sleep(duration)
-
-            else:
-                print("Error: Failed to capture frame")
-                break
+        while not stop.is_set():
+            grabbed = grabber.wait(last_seq, timeout=duration)
+            if grabbed is None:
+                if not grabber.running:
+                    break
+                # camera delivers slower than duration, the slot keeps the previous frame
+                stats.repeated += 1
+                next_time += duration
+                continue
+            last_seq, frame, grab_time = grabbed
+
+            start = time.perf_counter()
+            x, y, w, h = 100, 100, 400, 300
+
+            frame = renderer.render(frame, x, y, w, h, "")
+            processed = time.perf_counter()
+
+            # Publish the frame, the store writes the JPEG snapshot if configured
+            seq = store.publish(frame)
+            published = time.perf_counter()
+            stats.process_time += processed - start
+            stats.publish_time += published - processed
+            stats.frame_age += time.monotonic() - grab_time
+            stats.processed += 1
+
+            logging.debug(f"Frame {seq} captured")
+            # Wait for the next slot of the schedule, skip the slots already missed
+            next_time += duration
+            now = time.monotonic()
+            if now > next_time:
+                stats.late += 1
+                missed = int((now - next_time) // duration)
+                stats.dropped += missed
+                next_time += missed * duration
+            stop.wait(max(0.0, next_time - now))
 
     finally:
+        grabber.stop()
         # Release the camera
         camera.release()
 
-def generate_osd_frame(frame,x, y, w, h,text):
-    # Define the coordinates of the rectangle region (x, y, width, height)
-
-    # Copy the original frame to prevent modification of the original image
-    osd_frame = frame.copy()
-
-    # Add text to the OSD frame
-    #text = "Recording"  # Example text
-    text_position = (50, 50)  # Position of the text
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    font_scale = 1
-    color = (255, 255, 255)  # White color
-    thickness = 2
-    cv2.putText(osd_frame, text, text_position, font, font_scale, color, thickness)
-
-    # Add a rectangle border to the OSD frame
-    border_color = (0, 0, 255)  # Red color
-    border_thickness = 2
-    cv2.rectangle(osd_frame, (x, y), (x+w, y+h), border_color, border_thickness)
-
-    return osd_frame
-
-def blur_outside_rectangle(frame, x, y, w, h):
-    # Create a mask with the same size as the frame
-    mask = np.zeros_like(frame, dtype=np.uint8)
-
-    # Define the rectangle region in the mask
-    cv2.rectangle(mask, (x, y), (x + w, y + h), (255, 255, 255), -1)
-
-    # Apply blur effect to the area outside the rectangle
-    blurred_frame = cv2.blur(frame, (21, 21))
-
-    # Apply the mask to blur only outside the rectangle
-    result = cv2.bitwise_and(frame, mask)
-    result += cv2.bitwise_and(blurred_frame, cv2.bitwise_not(mask))
-
-    return result
-
 
 if __name__ == "__main__":
     file_name = "app/static/image.jpg"  # Output file name
@@ -0,0 +1,246 @@
+"""
+Live frame streaming for the backend: MJPEG over multipart HTTP and WebSocket push
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import time
+
+import cv2
+
+from frame_cache import EncodedFrameCache
+from ladder import AUTO, RUNGS, EncodedLadder, choose_rung, encode_ladder
+
+MJPEG_BOUNDARY = "frame"
+MAX_STREAM_FPS = 30
+
+
+class SharedFrameEncoder:
+    """
+    Encodes each frame once per (width, height, quality) variant and hands the
+    same JPEG bytes to every viewer that asks for that variant.
+    """
+
+    def __init__(self, cache=None, pool=None):
+        self.cache = cache if cache is not None else EncodedFrameCache()
+        self.pool = pool  # ImageWorkerPool for the encode, None encodes on the event loop
+        self._locks = {}  # variant -> [asyncio.Lock, holders and waiters]
+
+    @contextlib.asynccontextmanager
+    async def _variant_lock(self, variant):
+        """
+        Lock of one variant, dropped when the last holder or waiter leaves: clients
+        pick the sizes and qualities, a lock per variant ever asked for would pile up
+        """
+        entry = self._locks.get(variant)
+        if entry is None:
+            entry = self._locks[variant] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[variant]
+
+    async def encode(self, frame, width=None, height=None, quality=80):
+        variant = ("stream", width, height, quality)
+        key = (frame.seq,) + variant
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry.jpeg
+        # viewers of the same variant wait for one encode instead of doing their own
+        async with self._variant_lock(variant):
+            render = lambda: encode_frame(frame.image, width, height, quality)
+            if self.pool is not None:
+                entry = await self.pool.run(self.cache.get_or_create, key, render)
+            else:
+                entry = self.cache.get_or_create(key, render)
+        return entry.jpeg
+
+    async def encode_rung(self, frame, rung, bandwidth=None):
+        """
+        JPEG of one ladder rung, the whole ladder is encoded once per frame and
+        shared with the image endpoints. rung "auto" picks by bandwidth (bytes/s).
+        """
+        key = (("seq", frame.seq), "ladder")
+        ladder = self.cache.get(key)
+        if ladder is None:
+            async with self._variant_lock("ladder"):
+                render = lambda: encode_ladder(frame.image)
+                if self.pool is not None:
+                    ladder = await self.pool.run(self.cache.get_or_create, key, render, EncodedLadder)
+                else:
+                    ladder = self.cache.get_or_create(key, render, EncodedLadder)
+        if rung == AUTO:
+            rung = choose_rung(ladder.sizes, bandwidth)
+        return ladder[rung].jpeg
+
+
+def target_size(image, width=None, height=None):
+    """Output size keeping the aspect ratio when only one side is given, never upscaled"""
+    src_h, src_w = image.shape[:2]
+    if width is None and height is None:
+        return src_w, src_h
+    if width is None:
+        width = round(src_w * height / src_h)
+    elif height is None:
+        height = round(src_h * width / src_w)
+    return min(width, src_w), min(height, src_h)
+
+
+def encode_frame(image, width=None, height=None, quality=80):
+    size = target_size(image, width, height)
+    if size != (image.shape[1], image.shape[0]):
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    _, encoded_image = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded_image.tobytes()
+
+
+def mjpeg_part(jpeg):
+    header = (f"--{MJPEG_BOUNDARY}\r\n"
+              f"Content-Type: image/jpeg\r\n"
+              f"Content-Length: {len(jpeg)}\r\n\r\n").encode()
+    return header + jpeg + b"\r\n"
+
+
+async def mjpeg_stream(store, encoder, fps=10, width=None, height=None, quality=80,
+                       rung=None, bandwidth=None, client=None):
+    """
+    Yields multipart parts for every new frame in store, at most fps per second.
+    Frames published faster than that are skipped, the viewer always gets the latest one.
+
+    With rung set the frames come from the encode ladder instead of width/height/quality.
+    For rung "auto" the time each part's send blocked (write backpressure from a
+    client slower than the stream) is fed to bandwidth (a BandwidthEstimator)
+    under client and picks the next rung.
+    """
+    period = 1.0 / max(1, min(fps, MAX_STREAM_FPS))
+    last_seq = 0
+    next_time = time.monotonic()
+    while True:
+        frame = await store.next_frame(last_seq, timeout=5.0)
+        if frame is None:
+            # nothing new, repeat the last frame so proxies keep the connection open
+            frame = store.latest()
+            if frame is None:
+                continue
+        last_seq = frame.seq
+        if rung is None:
+            yield mjpeg_part(await encoder.encode(frame, width, height, quality))
+        else:
+            estimate = bandwidth.estimate(client) if bandwidth is not None else None
+            part = mjpeg_part(await encoder.encode_rung(frame, rung, estimate))
+            start = time.perf_counter()
+            # the generator resumes after the response has sent the part
+            yield part
+            if bandwidth is not None:
+                bandwidth.update(client, len(part), time.perf_counter() - start)
+        next_time = max(next_time + period, time.monotonic())
+        await asyncio.sleep(next_time - time.monotonic())
+
+
+class WebSocketViewer:
+    """
+    Pushes binary JPEG frames and JSON status messages to one WebSocket client.
+
+    There is no per-client queue: after each send the viewer takes whatever
+    frame is newest, so a slow client skips frames instead of falling behind.
+    The client can change its settings by sending
+    {"fps": 5, "width": 320, "height": 240, "quality": 60}, or {"rung": "small"}
+    to get frames from the encode ladder ("auto" picks by the measured send time,
+    null goes back to width/height/quality).
+    """
+    STATUS_INTERVAL = 1.0  # seconds
+
+    def __init__(self, websocket, store, encoder, status=None, fps=10, width=None, height=None, quality=80,
+                 rung=None, bandwidth=None, client=None):
+        self.websocket = websocket
+        self.store = store
+        self.encoder = encoder
+        self.status = status
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.quality = quality
+        self.rung = rung
+        self.bandwidth = bandwidth
+        self.client = client
+        self.sent = 0
+        self.skipped = 0
+
+    async def run(self):
+        receiver = asyncio.create_task(self._receive())
+        sender = asyncio.create_task(self._send())
+        try:
+            await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            receiver.cancel()
+            sender.cancel()
+            await asyncio.gather(receiver, sender, return_exceptions=True)
+
+    async def _receive(self):
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            text = message.get("text")
+            if text:
+                self._apply_settings(text)
+
+    def _apply_settings(self, text):
+        try:
+            settings = json.loads(text)
+            if "fps" in settings:
+                self.fps = max(1, min(int(settings["fps"]), MAX_STREAM_FPS))
+            if "width" in settings:
+                self.width = int(settings["width"]) if settings["width"] else None
+            if "height" in settings:
+                self.height = int(settings["height"]) if settings["height"] else None
+            if "quality" in settings:
+                self.quality = max(1, min(int(settings["quality"]), 100))
+            if "rung" in settings:
+                if settings["rung"] not in RUNGS and settings["rung"] not in (AUTO, None):
+                    raise ValueError(settings["rung"])
+                self.rung = settings["rung"]
+        except (ValueError, TypeError, AttributeError):
+            logging.warning(f"Ignoring bad WebSocket settings message: {text!r}")
+
+    async def _send(self):
+        last_seq = 0
+        last_status = 0.0
+        next_time = time.monotonic()
+        while True:
+            frame = await self.store.next_frame(last_seq, timeout=self.STATUS_INTERVAL)
+            if frame is not None:
+                if last_seq:
+                    self.skipped += frame.seq - last_seq - 1
+                last_seq = frame.seq
+                if self.rung is None:
+                    jpeg = await self.encoder.encode(frame, self.width, self.height, self.quality)
+                else:
+                    jpeg = await self.encoder.encode_rung(frame, self.rung, self._bandwidth_estimate())
+                start = time.perf_counter()
+                await self.websocket.send_bytes(jpeg)
+                if self.rung is not None and self.bandwidth is not None:
+                    self.bandwidth.update(self.client, len(jpeg), time.perf_counter() - start)
+                self.sent += 1
+            now = time.monotonic()
+            if self.status is not None and now - last_status >= self.STATUS_INTERVAL:
+                last_status = now
+                await self.websocket.send_text(json.dumps(self._status_message()))
+            if frame is not None:
+                next_time = max(next_time + 1.0 / self.fps, now)
+                await asyncio.sleep(next_time - now)
+
+    def _bandwidth_estimate(self):
+        return self.bandwidth.estimate(self.client) if self.bandwidth is not None else None
+
+    def _status_message(self):
+        message = {"type": "status", "seq": self.store.seq, "sent": self.sent, "skipped": self.skipped}
+        if self.rung is not None:
+            message["rung"] = self.rung
+        message.update(self.status())
+        return message
@@ -0,0 +1,270 @@
+"""
+Synthetic camera: moving test patterns or a replayed video, fed through the same
+overlay and frame store path as the RGB camera, to measure what the pipeline sustains
+"""
+import argparse
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from frame_store import FrameStore
+from overlay import OverlayRenderer
+
+PATTERNS = ("bars", "box", "noise", "video")
+VIDEO_PATH = "test_data/test.mp4"
+
+
+class PatternGenerator:
+    """Cheap moving test images, the expensive part is built once and shifted"""
+
+    def __init__(self, pattern, width, height, seed=0):
+        self.pattern = pattern
+        self.width = width
+        self.height = height
+        self.index = 0
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        if pattern == "bars":
+            colors = np.array([[255, 255, 255], [0, 255, 255], [255, 255, 0], [0, 255, 0],
+                               [255, 0, 255], [0, 0, 255], [255, 0, 0], [0, 0, 0]], dtype=np.uint8)
+            columns = colors[(np.arange(width) * len(colors)) // width]
+            self.base = np.repeat(columns[None, :, :], height, axis=0)
+        elif pattern == "box":
+            self.base = np.dstack([np.broadcast_to(x, (height, width)),
+                                   np.broadcast_to(y, (height, width)),
+                                   np.full((height, width), 128, np.float32)]).astype(np.uint8)
+        elif pattern == "noise":
+            self.base = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+        else:
+            raise ValueError(f"Unknown pattern {pattern}, use one of {PATTERNS}")
+
+    def read(self):
+        self.index += 1
+        if self.pattern == "box":
+            frame = self.base.copy()
+            size = max(8, self.height // 6)
+            x = (self.index * 7) % max(1, self.width - size)
+            y = (self.index * 3) % max(1, self.height - size)
+            frame[y:y + size, x:x + size] = (255, 255, 255)
+        else:
+            frame = np.roll(self.base, self.index * 4, axis=1)
+        cv2.putText(frame, str(self.index), (20, self.height - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+        return frame
+
+    def release(self):
+        pass
+
+
+class VideoLoop:
+    """Frames of a video file in a loop, resized to the requested resolution"""
+
+    def __init__(self, path, width, height):
+        self.path = path
+        self.size = (width, height)
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise FileNotFoundError(f"Cannot open video {path}")
+
+    def read(self):
+        ret, frame = self.capture.read()
+        if not ret:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+            if not ret:
+                raise IOError(f"Cannot read frames from {self.path}")
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_LINEAR)
+        return frame
+
+    def release(self):
+        self.capture.release()
+
+
+class SyntheticFrameSource:
+    """
+    Produces frames at a fixed rate on its own thread, applies the same
+    overlay as rgb_camera.capture_and_save_photos and publishes into store.
+
+    Every frame has a deadline on a monotonic clock. A frame published after
+    its deadline counts as late; if the loop falls a whole period or more
+    behind, the missed slots are skipped and counted as dropped.
+    """
+
+    def __init__(self, store, pattern="bars", width=1920, height=1080, fps=30, video_path=VIDEO_PATH, overlay=True):
+        self.store = store
+        self.pattern = pattern
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.video_path = video_path
+        self.overlay = overlay
+        self.produced = 0
+        self.late = 0
+        self.dropped = 0
+        self.read_time = 0.0
+        self.process_time = 0.0
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _open(self):
+        if self.pattern == "video":
+            return VideoLoop(self.video_path, self.width, self.height)
+        return PatternGenerator(self.pattern, self.width, self.height)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="synthetic-camera", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        source = self._open()
+        renderer = OverlayRenderer()
+        x, y, w, h = 100, 100, 400, 300
+        period = 1.0 / self.fps
+        self.started = time.monotonic()
+        deadline = self.started + period
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                frame = source.read()
+                read_done = time.perf_counter()
+                if self.overlay:
+                    frame = renderer.render(frame, x, y, w, h, "")
+                self.store.publish(frame)
+                done = time.perf_counter()
+                self.read_time += read_done - start
+                self.process_time += done - read_done
+                self.produced += 1
+                now = time.monotonic()
+                if now > deadline:
+                    self.late += 1
+                    missed = int((now - deadline) // period)
+                    self.dropped += missed
+                    deadline += missed * period
+                deadline += period
+                delay = deadline - period - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+        finally:
+            source.release()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        produced = max(self.produced, 1)
+        return {
+            "pattern": self.pattern,
+            "resolution": f"{self.width}x{self.height}",
+            "target_fps": self.fps,
+            "fps": round(self.produced / elapsed, 2) if elapsed else 0.0,
+            "produced": self.produced,
+            "late": self.late,
+            "dropped": self.dropped,
+            "avg_read_ms": round(self.read_time / produced * 1000, 3),
+            "avg_process_ms": round(self.process_time / produced * 1000, 3),
+        }
+
+
+class EncodeConsumer:
+    """
+    Encodes the newest frame of a store as fast as it can, like a stream viewer,
+    and counts the frames it never saw
+    """
+
+    def __init__(self, store, width=None, height=None, quality=80):
+        self.store = store
+        self.width = width
+        self.height = height
+        self.quality = quality
+        self.encoded = 0
+        self.missed = 0
+        self.encode_time = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="encode-consumer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        from streaming import encode_frame
+        last_seq = self.store.seq
+        while not self._stop.is_set():
+            frame = self.store.wait(last_seq, timeout=0.1)
+            if frame is None:
+                continue
+            self.missed += frame.seq - last_seq - 1
+            last_seq = frame.seq
+            start = time.perf_counter()
+            encode_frame(frame.image, self.width, self.height, self.quality)
+            self.encode_time += time.perf_counter() - start
+            self.encoded += 1
+
+    def stats(self):
+        encoded = max(self.encoded, 1)
+        return {"encoded": self.encoded, "missed": self.missed,
+                "avg_encode_ms": round(self.encode_time / encoded * 1000, 3)}
+
+
+def parse_spec(spec):
+    """
+    "bars:1920x1080@60" -> dict(pattern="bars", width=1920, height=1080, fps=60),
+    resolution and rate are optional
+    """
+    pattern, _, rest = spec.partition(":")
+    size, _, fps = rest.partition("@")
+    options = {"pattern": pattern or "bars"}
+    if size:
+        width, _, height = size.lower().partition("x")
+        options.update(width=int(width), height=int(height))
+    if fps:
+        options["fps"] = float(fps)
+    if options["pattern"] not in PATTERNS:
+        raise ValueError(f"Unknown pattern {options['pattern']}, use one of {PATTERNS}")
+    return options
+
+
+def run_load(pattern="bars", width=1920, height=1080, fps=60, seconds=10.0, consumers=1,
+             consumer_width=None, video_path=VIDEO_PATH):
+    """Runs a source and encode consumers for seconds, returns their stats"""
+    store = FrameStore()
+    source = SyntheticFrameSource(store, pattern, width, height, fps, video_path)
+    readers = [EncodeConsumer(store, consumer_width) for _ in range(consumers)]
+    for reader in readers:
+        reader.start()
+    source.start()
+    time.sleep(seconds)
+    source.stop()
+    for reader in readers:
+        reader.stop()
+    return {"source": source.stats(), "consumers": [reader.stats() for reader in readers]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic camera load on the overlay/encode pipeline")
+    parser.add_argument("--pattern", choices=PATTERNS, default="bars")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=float, default=60)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--consumers", type=int, default=1, help="encode threads reading the newest frame")
+    parser.add_argument("--consumer-width", type=int, default=None, help="encode resized to this width")
+    parser.add_argument("--video", default=VIDEO_PATH)
+    args = parser.parse_args()
+    result = run_load(args.pattern, args.width, args.height, args.fps, args.seconds,
+                      args.consumers, args.consumer_width, args.video)
+    print(result["source"])
+    for index, consumer in enumerate(result["consumers"]):
+        print(f"consumer {index}: {consumer}")
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HSLIDAR_DIR = os.path.join(ROOT, "hslidar_from_RT")
+# the hslidar_from_RT modules import each other by name; after the root, which has its own utils.py
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+if HSLIDAR_DIR not in sys.path:
+    sys.path.append(HSLIDAR_DIR)
@@ -0,0 +1,120 @@
+import threading
+import time
+import types
+
+import numpy as np
+
+from acquisition import AcquisitionWorker, LineRing
+
+
+def _line(value, shape=(4, 8)):
+    return np.full(shape, value, np.uint16)
+
+
+def test_ring_keeps_every_line_in_order():
+    ring = LineRing(4, 4, 8)
+    for value in range(3):
+        assert ring.put(_line(value), float(value))
+    values = []
+    while len(ring):
+        number, line, timestamp = ring.peek(timeout=0)
+        values.append((number, int(line[0, 0]), timestamp))
+        ring.release()
+    assert values == [(0, 0, 0.0), (1, 1, 1.0), (2, 2, 2.0)]
+    assert ring.peek(timeout=0) is None
+
+
+def test_full_ring_drops_new_lines_when_keeping_all():
+    ring = LineRing(4, 4, 8)
+    results = [ring.put(_line(value), 0.0) for value in range(6)]
+    assert results == [True] * 4 + [False] * 2
+    assert ring.dropped == 2
+    # the unread lines are untouched, latest stays on the last one that fit
+    assert [int(line[0, 0]) for line in ring.lines] == [0, 1, 2, 3]
+    assert ring.latest()[0] == 3
+
+
+def test_live_ring_overwrites_oldest_and_latest_keeps_moving():
+    ring = LineRing(4, 4, 8, keep_all=False)
+    for value in range(1000):
+        assert ring.put(_line(value % 4096), 0.0)
+        number, line = ring.latest()
+        assert number == value and int(line[0, 0]) == value % 4096
+    assert ring.dropped == 0
+    assert ring.overwritten == 996
+    assert len(ring) == 4
+
+
+def test_latest_is_a_copy():
+    ring = LineRing(2, 4, 8, keep_all=False)
+    ring.put(_line(1), 0.0)
+    _, line = ring.latest()
+    ring.put(_line(2), 0.0)
+    ring.put(_line(3), 0.0)
+    assert int(line[0, 0]) == 1
+
+
+def test_peek_wakes_up_on_put_from_another_thread():
+    ring = LineRing(8, 4, 8)
+    received = []
+
+    def consume():
+        while len(received) < 100:
+            line = ring.peek(timeout=2)
+            assert line is not None
+            received.append(int(line[1][0, 0]))
+            ring.release()
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    value = refused = 0
+    while value < 100:
+        if ring.put(_line(value), 0.0):
+            value += 1
+        else:
+            refused += 1
+            time.sleep(0.0001)
+    consumer.join(timeout=5)
+    assert received == list(range(100))
+    assert ring.dropped == refused
+
+
+class _Buffer:
+    def __init__(self, value):
+        component = types.SimpleNamespace(height=4, width=8, data=np.full(32, value, np.uint16))
+        self.payload = types.SimpleNamespace(components=[component])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class _Acquirer:
+    """Delivers numbered frames as fast as they are fetched"""
+
+    def __init__(self):
+        self.count = 0
+
+    def try_fetch(self, timeout):
+        self.count += 1
+        time.sleep(0.0002)
+        return _Buffer(self.count % 4096)
+
+
+def test_live_worker_keeps_showing_new_lines_without_consumer():
+    worker = AcquisitionWorker(_Acquirer(), fps=1000, slots=8, keep_all=False).start()
+    try:
+        worker.wait_ring(timeout=2)
+        deadline = time.monotonic() + 5
+        while worker.fetched < 50 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        first = worker.latest()[0]
+        while worker.latest()[0] == first and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert worker.latest()[0] > first > 8
+        assert worker.stats()['dropped'] == 0
+    finally:
+        worker.stop()
+    assert not worker.running
@@ -0,0 +1,30 @@
+import threading
+import time
+
+import pytest
+
+main = pytest.importorskip("main")
+testclient = pytest.importorskip("fastapi.testclient")
+
+
+def _image_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith("image")]
+
+
+def _wait_ready(client, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while client.get("/health/ready").status_code != 200:
+        assert time.monotonic() < deadline, "backend not ready"
+        time.sleep(0.05)
+
+
+def test_shutdown_stops_image_workers_and_app_starts_again():
+    for _ in range(2):
+        with testclient.TestClient(main.app) as client:
+            _wait_ready(client)
+            assert client.get("/image").status_code == 200
+            assert _image_threads()
+        deadline = time.monotonic() + 5
+        while _image_threads() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not _image_threads()
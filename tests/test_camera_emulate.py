@@ -0,0 +1,88 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from camera_emulate import VideoReplaySource
+from frame_store import FrameStore
+
+FPS = 50
+FRAMES = 20
+
+
+def _write_video(path, frames):
+    # frame i is a flat gray of 10 * i, readable back through the JPEG encoding
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), FPS, (64, 48))
+    for index in range(frames):
+        writer.write(np.full((48, 64, 3), 10 * index, np.uint8))
+    writer.release()
+    return str(path)
+
+
+def _index(frame):
+    return int(round(frame.image.mean() / 10))
+
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+@pytest.fixture
+def video(tmp_path):
+    return _write_video(tmp_path / "clip.avi", FRAMES)
+
+
+def test_seek_before_start_raises(video):
+    source = VideoReplaySource(FrameStore(), video)
+    with pytest.raises(RuntimeError):
+        source.seek(1.0)
+
+
+def test_seek_after_end_without_loop_plays_again(video):
+    store = FrameStore()
+    source = VideoReplaySource(store, video, speed=4.0, loop=False).start()
+    try:
+        assert _wait(lambda: source.finished)
+        published = source.published
+        assert _index(store.latest()) == FRAMES - 1
+        source.seek(0.1)
+        assert not source.finished
+        assert _wait(lambda: source.finished and source.published > published)
+        assert source.running
+    finally:
+        source.stop()
+    assert not source.running
+
+
+def test_seek_discards_prefetched_frames(video):
+    store = FrameStore()
+    source = VideoReplaySource(store, video, speed=0.5, loop=True, prefetch=8).start()
+    try:
+        assert _wait(lambda: store.seq >= 2)
+        source.seek(15 / FPS)
+        seq = store.seq
+        assert _wait(lambda: store.seq > seq + 1)
+        # the first frame after the seek may already have been due, everything
+        # published after it comes from the new position
+        assert _index(store.latest()) >= 15
+    finally:
+        source.stop()
+
+
+def test_file_without_frames_stops_with_error(tmp_path):
+    path = _write_video(tmp_path / "empty.avi", 0)
+    source = VideoReplaySource(FrameStore(), path, loop=True).start()
+    try:
+        assert _wait(lambda: source.error is not None)
+        decoded, loops = source.decoded, source.loops
+        time.sleep(0.1)
+        assert (source.decoded, source.loops) == (decoded, loops) == (0, 0)
+        assert source.stats()["error"]
+    finally:
+        source.stop()
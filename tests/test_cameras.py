@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+from cameras import Camera
+
+
+def test_only_emulators_and_rigs_move():
+    synthetic = Camera("synth", "synthetic", "bars:64x48@1")
+    assert not synthetic.movable and not synthetic.info()["movable"]
+    with pytest.raises(RuntimeError):
+        asyncio.run(synthetic._apply_movement(1, 0))
+    synthetic.stop()
+    moves = []
+    rig = Camera("rig", "file", "image.jpg")
+    rig.hardware_move = lambda camera, dx, dy: moves.append((camera.camera_id, dx, dy))
+    assert rig.movable
+    asyncio.run(rig._apply_movement(2, -1))
+    rig.stop()
+    assert moves == [("rig", 2, -1)]
+
+
+def test_move_routes_refuse_cameras_that_cannot_move():
+    main = pytest.importorskip("main")
+    camera = Camera("synth", "synthetic", "bars:64x48@1")
+    with pytest.raises(main.HTTPException) as error:
+        asyncio.run(main.move_camera(camera, "left", "1"))
+    assert error.value.status_code == 400
+    assert camera.movement.pending == 0
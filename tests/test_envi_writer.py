@@ -0,0 +1,91 @@
+import os
+
+import h5py
+import numpy as np
+import pytest
+
+from envi_writer import EnviBilWriter, envi_from_raw
+from radiometry import Reflectance
+from raw_store import RawFrameWriter
+
+
+def read_header(path):
+    with open(path) as file:
+        lines = file.read().splitlines()
+    assert lines[0] == "ENVI"
+    return dict(line.split(" = ", 1) for line in lines[1:])
+
+
+def read_bil(base, lines, bands, samples, dtype=np.uint16):
+    return np.fromfile(base + ".img", dtype).reshape(lines, bands, samples)
+
+
+def test_grows_past_planned_lines_and_trims_on_close(tmp_path):
+    base = str(tmp_path / "scan")
+    frames = [np.full((3, 5), line, np.uint16) + np.arange(5, dtype=np.uint16) for line in range(7)]
+    with EnviBilWriter(base, 2, 3, 5, wavelengths=[400, 500, 600], growth=1.5, description="test") as image:
+        for line, frame in enumerate(frames):
+            assert image.add_frame(frame.ravel()) == line
+        assert len(image) == 7
+        assert np.array_equal(image.line(4), frames[4])
+    assert os.path.getsize(base + ".img") == 7 * 3 * 5 * 2
+    assert np.array_equal(read_bil(base, 7, 3, 5), np.stack(frames))
+    header = read_header(base + ".hdr")
+    assert (header["samples"], header["lines"], header["bands"]) == ("5", "7", "3")
+    assert header["interleave"] == "bil" and header["data type"] == "12"
+    assert header["description"] == "test"
+    assert header["wavelength"] == "{400.00, 500.00, 600.00}"
+
+
+def test_trims_unused_planned_lines_and_close_is_idempotent(tmp_path):
+    base = str(tmp_path / "scan")
+    image = EnviBilWriter(base, 100, 2, 4, np.float32)
+    image.add_frame(np.ones((2, 4), np.float32))
+    image.close()
+    image.close()
+    assert os.path.getsize(base + ".img") == 2 * 4 * 4
+    header = read_header(base + ".hdr")
+    assert header["lines"] == "1" and header["data type"] == "4"
+    assert "wavelength" not in header
+
+
+def test_envi_from_raw_matches_capture_layout(tmp_path):
+    raw = str(tmp_path / "raw.hdf5")
+    frames = [np.arange(12, dtype=np.uint16).reshape(3, 4) * (line + 1) for line in range(5)]
+    with RawFrameWriter(raw, 3, 4, chunk_lines=2) as writer:
+        for frame in frames:
+            writer.append(frame.ravel())
+    base = str(tmp_path / "scan")
+    with h5py.File(raw, "r") as f:
+        assert envi_from_raw(f, base) == 5
+    # same as writing each sensor frame as it comes in
+    with EnviBilWriter(str(tmp_path / "live"), 5, 3, 4) as image:
+        for frame in frames:
+            image.add_frame(frame)
+    assert np.array_equal(read_bil(base, 5, 3, 4), read_bil(str(tmp_path / "live"), 5, 3, 4))
+    assert read_header(base + ".hdr")["lines"] == "5"
+
+
+def test_envi_from_raw_legacy_layout_and_reflectance(tmp_path):
+    raw = str(tmp_path / "legacy.hdf5")
+    with h5py.File(raw, "w") as f:
+        for line in range(3):
+            f[str(line)] = np.full((2, 3), 10 + 10 * line, np.uint16)
+    reflectance = Reflectance(np.full((2, 3), 10.0), np.full((2, 3), 30.0), np.uint16)
+    base = str(tmp_path / "scan")
+    with h5py.File(raw, "r") as f:
+        assert envi_from_raw(f, base, frames=2, radiometry=reflectance) == 2
+    assert np.array_equal(read_bil(base, 2, 2, 3), np.stack([np.zeros((2, 3)), np.full((2, 3), 5000)]))
+    assert read_header(base + ".hdr")["reflectance scale factor"] == "10000"
+
+
+def test_no_wavelengths_unless_calibrated(tmp_path):
+    raw = str(tmp_path / "raw.hdf5")
+    with RawFrameWriter(raw, 3, 4) as writer:
+        writer.append(np.zeros(12, np.uint16))
+    base = str(tmp_path / "scan")
+    with h5py.File(raw, "r") as f:
+        envi_from_raw(f, base)
+    assert "wavelength" not in read_header(base + ".hdr")
+    with pytest.raises(ValueError):
+        EnviBilWriter(str(tmp_path / "bad"), 1, 3, 4, wavelengths=[400, 500])
@@ -0,0 +1,32 @@
+import base64
+
+from frame_cache import EncodedFrame, EncodedFrameCache
+
+
+def test_least_recently_used_entry_evicted():
+    cache = EncodedFrameCache(max_entries=2)
+    cache.put((1, "small"), EncodedFrame(b"a"))
+    cache.put((1, "full"), EncodedFrame(b"b"))
+    assert cache.get((1, "small")).jpeg == b"a"
+    cache.put((2, "small"), EncodedFrame(b"c"))
+    assert len(cache) == 2
+    assert cache.get((1, "full")) is None
+    assert cache.get((1, "small")) is not None
+    assert cache.hits == 2
+
+
+def test_get_or_create_renders_once_per_key():
+    cache = EncodedFrameCache()
+    renders = []
+
+    def render():
+        renders.append(1)
+        return b"jpeg"
+
+    first = cache.get_or_create((7, 80), render)
+    second = cache.get_or_create((7, 80), render)
+    assert first is second and len(renders) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert first.base64 == base64.b64encode(b"jpeg").decode()
+    cache.clear()
+    assert len(cache) == 0
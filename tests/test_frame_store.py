@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from frame_store import FrameStore
+
+
+def test_render_is_lazy_and_runs_once():
+    store = FrameStore()
+    renders = []
+
+    def render():
+        renders.append(1)
+        return np.zeros((4, 4, 3), np.uint8)
+
+    seq = store.publish(render=render)
+    frame = store.latest()
+    assert seq == frame.seq == 1
+    assert not frame.rendered and renders == []
+    readers = [threading.Thread(target=lambda: frame.image) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    assert frame.rendered and len(renders) == 1
+    assert frame.image is frame.image
+
+
+def test_unread_frames_are_never_rendered():
+    store = FrameStore()
+    renders = []
+    for value in range(5):
+        store.publish(render=lambda value=value: renders.append(value) or np.full((2, 2), value, np.uint8))
+    assert store.latest().image[0, 0] == 4
+    assert renders == [4] and store.seq == 5
+
+
+def test_snapshot_renders_on_publish(tmp_path):
+    store = FrameStore(snapshot_path=str(tmp_path / "image.jpg"))
+    store.publish(render=lambda: np.full((8, 8, 3), 128, np.uint8))
+    assert store.latest().rendered
+    assert (tmp_path / "image.jpg").exists() and not (tmp_path / "image.tmp.jpg").exists()
+
+
+def test_wait_and_next_frame():
+    store = FrameStore()
+    assert store.latest() is None
+    assert store.wait(0, timeout=0.01) is None
+
+    async def reader():
+        waiting = asyncio.ensure_future(store.next_frame(0, timeout=2.0))
+        await asyncio.sleep(0.01)
+        threading.Thread(target=store.publish, args=(np.zeros((2, 2), np.uint8),)).start()
+        frame = await waiting
+        timed_out = await store.next_frame(frame.seq, timeout=0.01)
+        return frame, timed_out
+
+    frame, timed_out = asyncio.run(reader())
+    assert frame.seq == 1 and timed_out is None
+    assert store.wait(0).seq == 1
+    assert store._waiters == set()
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+hspec_camera = pytest.importorskip("hspec_camera")  # needs harvesters and spectral
+
+
+class FakeIA:
+    def __init__(self):
+        self.calls = []
+
+    def stop(self):
+        self.calls.append("stop")
+
+    def destroy(self):
+        self.calls.append("destroy")
+
+
+class FakeWorker:
+    def stop(self):
+        time.sleep(0.05)
+
+    def stats(self):
+        return {}
+
+
+def camera_without_hardware():
+    camera = hspec_camera.Camera.__new__(hspec_camera.Camera)
+    camera._ia = FakeIA()
+    camera.acquisition = FakeWorker()
+    camera._scan = None
+    camera._acquisition_lock = threading.Lock()
+    return camera
+
+
+def test_stop_acquisition_from_two_threads_closes_once():
+    camera = camera_without_hardware()
+    ia = camera._ia
+    threads = [threading.Thread(target=camera.stop_acquisition) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert ia.calls == ["stop", "destroy"]
+    assert camera.acquisition is None and camera._ia is None
+
+
+def test_close_camera_waits_for_the_scan_writer():
+    camera = camera_without_hardware()
+    events = []
+    camera._scan = threading.Thread(target=lambda: (time.sleep(0.1), events.append("scan closed")))
+    camera._scan.start()
+    camera._h = type("Harvester", (), {"reset": lambda self: events.append("reset")})()
+    camera.close_camera()
+    assert events == ["scan closed", "reset"]
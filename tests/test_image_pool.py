@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from image_pool import ImageWorkerPool
+
+
+def test_shutdown_takes_cancelled_jobs_off_the_queue():
+    pool = ImageWorkerPool(workers=1)
+    release = threading.Event()
+
+    async def jobs():
+        running = asyncio.ensure_future(pool.run(release.wait, 5))
+        queued = [asyncio.ensure_future(pool.run(lambda: None)) for _ in range(3)]
+        while pool.stats()["queued"] < 3:
+            await asyncio.sleep(0.01)
+        pool.shutdown()
+        release.set()
+        return await asyncio.gather(running, *queued, return_exceptions=True)
+
+    results = asyncio.run(jobs())
+    assert results[0] is True
+    assert all(isinstance(result, asyncio.CancelledError) for result in results[1:])
+    stats = pool.stats()
+    assert (stats["queued"], stats["active"], stats["cancelled"], stats["completed"]) == (0, 0, 3, 1)
+
+
+def test_cancelled_caller_leaves_the_queue_and_pool_restarts():
+    pool = ImageWorkerPool(workers=1)
+    release = threading.Event()
+
+    async def jobs():
+        running = asyncio.ensure_future(pool.run(release.wait, 5))
+        waiting = asyncio.ensure_future(pool.run(lambda: None))
+        while pool.stats()["queued"] < 1:
+            await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        release.set()
+        await running
+
+    asyncio.run(jobs())
+    assert pool.stats()["queued"] == 0 and pool.stats()["cancelled"] == 1
+    pool.shutdown()
+    assert asyncio.run(pool.run(sum, (1, 2))) == 3
+    pool.shutdown()
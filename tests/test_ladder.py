@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from ladder import DEFAULT_RUNG, RUNGS, BandwidthEstimator, choose_rung, encode_ladder
+
+SIZES = {"thumb": 3_000, "small": 10_000, "medium": 40_000, "full": 200_000}
+
+
+def test_choose_rung_without_estimate_is_default():
+    assert choose_rung(SIZES, None) == DEFAULT_RUNG
+
+
+@pytest.mark.parametrize("bandwidth, rung", [
+    (1_000, "thumb"),  # even thumb is too big, the smallest is still served
+    (30_000, "thumb"),
+    (100_000, "small"),
+    (400_000, "medium"),
+    (2_000_000, "full"),
+])
+def test_choose_rung_largest_within_budget(bandwidth, rung):
+    assert choose_rung(SIZES, bandwidth, budget=0.1) == rung
+
+
+def test_encode_ladder_sizes_grow_and_never_upscale():
+    image = np.random.default_rng(0).integers(0, 256, (240, 400, 3), dtype=np.uint8)
+    encoded = encode_ladder(image)
+    assert list(encoded) == list(reversed(RUNGS))
+    sizes = [len(encoded[name]) for name in RUNGS]
+    assert sizes == sorted(sizes)
+
+
+def test_estimator_follows_blocking_sends():
+    estimator = BandwidthEstimator(alpha=0.5)
+    # a client on a 100 kB/s link: each 10 kB frame blocks the stream for 0.1 s
+    for _ in range(20):
+        estimator.update("phone", 10_000, 0.1)
+    assert estimator.estimate("phone") == pytest.approx(100_000)
+    assert choose_rung(SIZES, estimator.estimate("phone")) == "small"
+    assert estimator.estimate("other") is None
+
+
+def test_estimator_evicts_least_recent_client():
+    estimator = BandwidthEstimator(max_clients=2)
+    estimator.update("a", 1, 1)
+    estimator.update("b", 1, 1)
+    estimator.update("a", 1, 1)
+    estimator.update("c", 1, 1)
+    assert estimator.estimate("b") is None
+    assert estimator.estimate("a") is not None and estimator.estimate("c") is not None
+
+
+@pytest.fixture(scope="module")
+def client():
+    main = pytest.importorskip("main")
+    testclient = pytest.importorskip("fastapi.testclient")
+    with testclient.TestClient(main.app) as client:
+        yield client
+
+
+def test_one_shot_responses_do_not_feed_auto(client):
+    # earlier single responses must not be taken for the client's bandwidth
+    for _ in range(3):
+        assert client.get("/image").status_code == 200
+    auto = client.get("/image?rung=auto")
+    default = client.get(f"/image?rung={DEFAULT_RUNG}")
+    assert auto.status_code == 200
+    assert len(auto.content) == len(default.content)
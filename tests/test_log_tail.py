@@ -0,0 +1,48 @@
+import log_tail
+from log_tail import level_filter, line_level, tail_lines
+
+
+def log_line(number, level="INFO"):
+    return f"[2024-01-01 10:00:00,000.000] {level} [1234] - message {number} " + "x" * (number % 37)
+
+
+def write_log(path, lines, newline="\n"):
+    with open(path, "w", newline="") as file:
+        file.write(newline.join(lines) + newline)
+
+
+def test_tail_across_block_boundaries(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_tail, "BLOCK_SIZE", 64)
+    lines = [log_line(number) for number in range(200)]
+    path = str(tmp_path / "app.log")
+    write_log(path, lines)
+    for n in (1, 5, 37, 200, 500):
+        assert tail_lines(path, n) == lines[-n:]
+
+
+def test_tail_without_trailing_newline_and_crlf(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_tail, "BLOCK_SIZE", 16)
+    path = str(tmp_path / "app.log")
+    lines = [log_line(number) for number in range(10)]
+    with open(path, "w") as file:
+        file.write("\n".join(lines))
+    assert tail_lines(path, 3) == lines[-3:]
+    write_log(path, lines, "\r\n")
+    assert tail_lines(path, 4) == lines[-4:]
+
+
+def test_level_filter_skips_lower_levels(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_tail, "BLOCK_SIZE", 64)
+    lines = [log_line(number, "ERROR" if number % 10 == 0 else "INFO") for number in range(100)]
+    lines.insert(51, "Traceback (most recent call last):")
+    path = str(tmp_path / "app.log")
+    write_log(path, lines)
+    assert tail_lines(path, 3, level="error") == [log_line(70, "ERROR"), log_line(80, "ERROR"), log_line(90, "ERROR")]
+    assert line_level(lines[51]) is None
+    assert level_filter(None) is None
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("")
+    assert tail_lines(str(path), 5) == []
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from movement import MovementQueue
+
+
+def test_burst_coalesces_into_one_net_move():
+    moves = []
+
+    async def apply(dx, dy):
+        moves.append((dx, dy))
+
+    async def burst():
+        queue = MovementQueue(apply, window=0.01)
+        ids = [queue.submit("left") for _ in range(20)] + [queue.submit("right"), queue.submit("up", steps=3)]
+        assert queue.pending == 22
+        assert queue.status(ids[0])["state"] == "queued"
+        await queue._worker
+        return queue, ids
+
+    queue, ids = asyncio.run(burst())
+    assert moves == [(-19, -3)]
+    assert (queue.commands, queue.batches, queue.pending) == (22, 1, 0)
+    for command_id in ids:
+        status = queue.status(command_id)
+        assert status["state"] == "done" and status["net"] == [-19, -3] and status["batch_size"] == 22
+
+
+def test_commands_during_a_move_go_into_the_next_batch():
+    moves = []
+    states = []
+    release = None
+
+    async def apply(dx, dy):
+        moves.append((dx, dy))
+        if len(moves) == 1:
+            await release.wait()
+
+    async def two_batches():
+        nonlocal release
+        release = asyncio.Event()
+        queue = MovementQueue(apply, window=0.01)
+        first = queue.submit("down")
+        while not moves:
+            await asyncio.sleep(0.005)
+        states.append(queue.status(first)["state"])
+        second, third = queue.submit("left"), queue.submit("left")
+        release.set()
+        await queue._worker
+        return queue, first, second, third
+
+    queue, first, second, third = asyncio.run(two_batches())
+    assert states == ["running"]
+    assert moves == [(0, 1), (-2, 0)]
+    assert queue.status(first)["batch"] == 1
+    assert queue.status(second)["batch"] == queue.status(third)["batch"] == 2
+
+
+def test_moves_that_cancel_out_skip_apply_and_failures_are_reported():
+    moves = []
+
+    async def apply(dx, dy):
+        moves.append((dx, dy))
+        raise RuntimeError("rig unreachable")
+
+    async def run():
+        queue = MovementQueue(apply, window=0.01, max_history=2)
+        ids = [queue.submit("left"), queue.submit("right")]
+        await queue._worker
+        failing = queue.submit("up")
+        await queue._worker
+        return queue, ids, failing
+
+    queue, (left, right), failing = asyncio.run(run())
+    assert moves == [(0, -1)]
+    assert queue.status(left) is None  # only the last max_history commands are kept
+    assert queue.status(right)["state"] == "done" and queue.status(right)["net"] == [0, 0]
+    assert queue.status(failing)["state"] == "failed"
+
+
+def test_unknown_direction():
+    async def run():
+        with pytest.raises(KeyError):
+            MovementQueue(None).submit("sideways")
+
+    asyncio.run(run())
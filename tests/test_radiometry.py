@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from radiometry import REFLECTANCE_SCALE, Reflectance, RunningStats
+
+
+def test_running_stats_match_numpy():
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 4096, size=(50, 4, 6)).astype(np.uint16)
+    stats = RunningStats((4, 6))
+    assert not stats.variance.any()
+    for frame in frames:
+        stats.add(frame.ravel())
+    assert stats.count == 50
+    assert np.allclose(stats.mean, frames.mean(axis=0))
+    assert np.allclose(stats.variance, frames.var(axis=0, ddof=1))
+    assert np.allclose(stats.std, frames.std(axis=0, ddof=1))
+
+
+def test_reflectance_float32_and_bad_pixels():
+    dark = np.array([[100.0, 100.0, 100.0]])
+    white = np.array([[300.0, 100.0, 50.0]])  # dead, saturated-low
+    reflectance = Reflectance(dark, white)
+    assert reflectance.bad_pixels == 2
+    out = reflectance.apply(np.array([200, 500, 500], np.uint16))
+    assert out.dtype == np.float32
+    assert np.allclose(out, [[0.5, 0.0, 0.0]])
+
+
+def test_reflectance_uint16_scaled_and_clipped():
+    reflectance = Reflectance(np.full((1, 3), 100.0), np.full((1, 3), 200.0), np.uint16)
+    out = np.empty((1, 3), np.uint16)
+    result = reflectance.apply(np.array([[50, 150, 1000]], np.uint16), out=out)
+    assert result is out
+    assert out.tolist() == [[0, REFLECTANCE_SCALE // 2, 65535]]
+
+
+def test_reflectance_rejects_other_types():
+    with pytest.raises(ValueError):
+        Reflectance(np.zeros(2), np.ones(2), np.int32)
+
+
+def test_save_load_round_trip(tmp_path):
+    dark, white = RunningStats((2, 2)), RunningStats((2, 2))
+    for value in (10, 12):
+        dark.add(np.full((2, 2), value, np.uint16))
+        white.add(np.full((2, 2), value * 10, np.uint16))
+    reflectance = Reflectance.from_references(dark, white, dtype=np.uint16, scale=1000)
+    path = str(tmp_path / "calibration.npz")
+    reflectance.save(path)
+    loaded = Reflectance.load(path)
+    assert loaded.dtype == np.uint16 and loaded.scale == 1000
+    raw = np.full((2, 2), 110, np.uint16)
+    assert np.array_equal(loaded.apply(raw), reflectance.apply(raw))
+    assert loaded.apply(raw)[0, 0] == 1000
@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+import rate_limit
+from rate_limit import RateLimiter, TokenBucket, retry_after_header
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def limiter(monkeypatch, **kwargs):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return RateLimiter(limits={"frames": (2.0, 3)}, routes={"/image*": "frames"}, **kwargs), clock
+
+
+def test_bucket_refills_at_rate_up_to_burst():
+    bucket = TokenBucket(2.0, 3, now=0.0)
+    assert [bucket.take(0.0)[0] for _ in range(4)] == [True, True, True, False]
+    assert bucket.take(0.0) == (False, 0.5)
+    assert bucket.take(0.5) == (True, 0.0)
+    bucket.refill(100.0)
+    assert bucket.tokens == 3
+
+
+def test_burst_then_retry_after(monkeypatch):
+    limits, clock = limiter(monkeypatch)
+    assert [limits.check("a", "/image")[0] for _ in range(3)] == [True] * 3
+    allowed, retry_after, route_class = limits.check("a", "/image_small")
+    assert (allowed, route_class) == (False, "frames")
+    assert retry_after == 0.5 and retry_after_header(retry_after) == "1"
+    assert limits.rejected == 1
+    clock.now += 0.5
+    assert limits.check("a", "/image")[0]
+    assert limits.state("a")["frames"]["limited"]
+    assert limits.check("/other", "/logs") == (True, 0.0, None)
+
+
+def test_clients_have_their_own_buckets(monkeypatch):
+    limits, _ = limiter(monkeypatch)
+    for _ in range(3):
+        limits.check("a", "/image")
+    assert not limits.check("a", "/image")[0]
+    assert limits.check("b", "/image")[0]
+    assert limits.state("b")["frames"]["tokens"] == 2
+
+
+def test_least_recently_used_and_idle_buckets_evicted(monkeypatch):
+    limits, clock = limiter(monkeypatch, max_buckets=2, idle_timeout=10.0)
+    limits.check("a", "/image")
+    limits.check("b", "/image")
+    limits.check("a", "/image")
+    limits.check("c", "/image")
+    assert len(limits) == 2 and ("b", "frames") not in limits._buckets
+    clock.now += 11.0
+    limits.check("d", "/image")
+    assert list(limits._buckets) == [("d", "frames")]
+
+
+def test_concurrent_requests_never_exceed_burst():
+    limits = RateLimiter(limits={"frames": (0.001, 50)}, routes={"/image": "frames"})
+    allowed = []
+    start = threading.Barrier(8)
+
+    def client():
+        start.wait()
+        results = [limits.check("shared", "/image")[0] for _ in range(100)]
+        allowed.append(sum(results))
+
+    threads = [threading.Thread(target=client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(allowed) == 50
+    assert limits.rejected == 8 * 100 - 50
+
+
+class FakeConnection:
+    def __init__(self, host, api_key=None):
+        self.headers = {"x-api-key": api_key} if api_key else {}
+        self.client = type("Address", (), {"host": host})()
+
+
+def test_only_configured_api_keys_get_their_own_bucket(monkeypatch):
+    main = pytest.importorskip("main")
+    monkeypatch.setattr(main, "API_KEYS", frozenset({"operator"}))
+    assert main.client_key(FakeConnection("10.0.0.1", "operator")) == "key:operator"
+    assert main.client_key(FakeConnection("10.0.0.1", "made-up")) == "10.0.0.1"
+    assert main.client_key(FakeConnection("10.0.0.2")) == "10.0.0.2"
@@ -0,0 +1,62 @@
+import math
+import time
+
+import h5py
+import numpy as np
+
+import scanner
+from raw_store import FRAMES, POSITIONS, TIMESTAMPS, RawFrameWriter, read_lines
+
+
+def test_lines_written_in_chunks_and_trimmed(tmp_path):
+    path = str(tmp_path / "raw.hdf5")
+    frames = [np.full((6, 10), line, np.uint16) for line in range(11)]
+    with RawFrameWriter(path, 6, 10, chunk_lines=4, exposure=2000) as writer:
+        for line, frame in enumerate(frames):
+            assert writer.append(frame.ravel(), timestamp=float(line), position=100 + line) == line
+        assert len(writer) == 11
+    with h5py.File(path, "r") as f:
+        assert f[FRAMES].shape == (11, 6, 10)
+        assert f[FRAMES].chunks == (4, 6, 10)
+        assert f.attrs["lines"] == 11 and f.attrs["exposure"] == 2000
+        assert np.array_equal(read_lines(f, 3, 7), np.stack(frames[3:7]))
+        assert list(f[TIMESTAMPS][:]) == [float(line) for line in range(11)]
+        assert list(f[POSITIONS][:]) == [100.0 + line for line in range(11)]
+
+
+def test_missing_positions_are_nan(tmp_path):
+    path = str(tmp_path / "raw.hdf5")
+    with RawFrameWriter(path, 2, 2, chunk_lines=2) as writer:
+        writer.append(np.zeros(4, np.uint16), position=scanner.position_value(None))
+        writer.append(np.zeros(4, np.uint16))
+        writer.append(np.zeros(4, np.uint16), position=scanner.position_value(["4c", "37"]))
+    with h5py.File(path, "r") as f:
+        positions = f[POSITIONS][:]
+    assert math.isnan(positions[0]) and math.isnan(positions[1])
+    assert positions[2] == 0x4c37
+
+
+class _Ptr:
+    """Answers every other position request"""
+
+    def __init__(self):
+        self.requests = 0
+
+    def get_current_position(self):
+        self.requests += 1
+        return ["50", "00"] if self.requests % 2 else None
+
+
+def test_position_poller_reports_misses_as_nan():
+    ptr = _Ptr()
+    poller = scanner.PositionPoller(ptr, interval=0.001).start()
+    try:
+        seen = set()
+        deadline = time.monotonic() + 5
+        while len(seen) < 2 and time.monotonic() < deadline:
+            seen.add("nan" if math.isnan(poller.value) else poller.value)
+            time.sleep(0.0005)
+    finally:
+        poller.stop()
+    assert seen == {"nan", 0x5000}
+    assert poller.replies and poller.misses
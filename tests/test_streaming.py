@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import numpy as np
+
+from frame_store import FrameStore
+from streaming import MAX_STREAM_FPS, SharedFrameEncoder, WebSocketViewer, target_size
+
+
+def gray(value, width=64, height=48):
+    return np.full((height, width, 3), value, np.uint8)
+
+
+def test_target_size_keeps_aspect_and_never_upscales():
+    image = gray(0, 640, 480)
+    assert target_size(image) == (640, 480)
+    assert target_size(image, width=320) == (320, 240)
+    assert target_size(image, height=120) == (160, 120)
+    assert target_size(image, 1280, 960) == (640, 480)
+
+
+def test_viewers_of_one_variant_share_one_encode():
+    store = FrameStore()
+    store.publish(gray(100))
+    encoder = SharedFrameEncoder()
+
+    async def viewers():
+        frame = store.latest()
+        return await asyncio.gather(*(encoder.encode(frame, 32, None, 70) for _ in range(10)))
+
+    jpegs = asyncio.run(viewers())
+    assert len(set(jpegs)) == 1
+    assert encoder.cache.misses == 1
+
+
+def test_variant_locks_are_dropped_after_use():
+    store = FrameStore()
+    store.publish(gray(50))
+    encoder = SharedFrameEncoder()
+
+    async def many_variants():
+        frame = store.latest()
+        await asyncio.gather(*(encoder.encode(frame, width, None, quality)
+                               for width in range(8, 64, 8) for quality in (50, 60, 70)))
+        await encoder.encode_rung(frame, "small")
+
+    asyncio.run(many_variants())
+    assert encoder._locks == {}
+    assert len(encoder.cache) > 1
+
+
+class FakeWebSocket:
+    def __init__(self, messages, store, frames):
+        self.messages = messages
+        self.store = store
+        self.frames = frames
+        self.sent = []
+        self.texts = []
+
+    async def receive(self):
+        if self.messages:
+            return {"type": "websocket.receive", "text": self.messages.pop(0)}
+        while len(self.sent) < self.frames:
+            await asyncio.sleep(0.005)
+        return {"type": "websocket.disconnect"}
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+        # a slow client: several frames are published while it reads one
+        for _ in range(3):
+            self.store.publish(gray(len(self.sent) % 256))
+
+    async def send_text(self, text):
+        self.texts.append(json.loads(text))
+
+
+def test_websocket_viewer_settings_and_frame_skipping():
+    store = FrameStore()
+    store.publish(gray(0))
+    websocket = FakeWebSocket(['{"fps": 1000, "width": 16, "quality": 0}', "not json", '{"rung": "huge"}'],
+                              store, frames=4)
+    viewer = WebSocketViewer(websocket, store, SharedFrameEncoder(), status=lambda: {"camera": "test"})
+    asyncio.run(viewer.run())
+    assert (viewer.fps, viewer.width, viewer.height, viewer.quality, viewer.rung) == (MAX_STREAM_FPS, 16, None, 1, None)
+    assert viewer.sent == len(websocket.sent) >= 4
+    # every send publishes three frames, the viewer only takes the newest
+    assert viewer.skipped == 2 * (viewer.sent - 1)
+    assert websocket.texts[0]["type"] == "status" and websocket.texts[0]["camera"] == "test"
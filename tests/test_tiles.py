@@ -0,0 +1,40 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from tiles import TilePyramid
+
+
+@pytest.fixture
+def scene(tmp_path):
+    path = str(tmp_path / "scene.png")
+    cv2.imwrite(path, np.random.default_rng(0).integers(0, 256, (300, 600, 3), dtype=np.uint8))
+    return path
+
+
+def test_levels_and_tiles(scene, tmp_path):
+    pyramid = TilePyramid(scene, str(tmp_path / "tiles"), tile_size=128)
+    assert pyramid.max_zoom == 3  # 600 -> 300 -> 150 -> 75 px wide
+    assert pyramid.level_size(3) == (600, 300)
+    assert pyramid.level_size(0) == (75, 38)
+    assert pyramid.tile_count(3) == (5, 3)
+    assert pyramid.tile_count(0) == (1, 1)
+    tile = cv2.imdecode(np.frombuffer(pyramid.tile_bytes(3, 4, 2), np.uint8), cv2.IMREAD_COLOR)
+    assert tile.shape == (300 - 256, 600 - 512, 3)
+
+
+@pytest.mark.parametrize("z, x, y", [(4, 0, 0), (3, 5, 0), (0, 0, 1), (-1, 0, 0)])
+def test_missing_tiles_raise_key_error(scene, tmp_path, z, x, y):
+    pyramid = TilePyramid(scene, str(tmp_path / "tiles"), tile_size=128)
+    with pytest.raises(KeyError):
+        pyramid.tile_path(z, x, y)
+
+
+def test_rebuilt_when_source_changes(scene, tmp_path):
+    cache_dir = str(tmp_path / "tiles")
+    assert TilePyramid(scene, cache_dir, tile_size=128).ensure_built()["width"] == 600
+    cv2.imwrite(scene, np.zeros((100, 200, 3), np.uint8))
+    os.utime(scene, ns=(0, os.stat(scene).st_mtime_ns + 10 ** 9))
+    assert TilePyramid(scene, cache_dir, tile_size=128).ensure_built()["width"] == 200
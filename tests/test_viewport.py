@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from viewport import MemmapScene, ViewportEmulator
+
+
+@pytest.fixture
+def scene(tmp_path):
+    # pixel value encodes its position, 200 x 300 scene
+    ys, xs = np.mgrid[0:200, 0:300]
+    image = np.dstack([xs % 256, ys % 256, np.zeros_like(xs)]).astype(np.uint8)
+    path = str(tmp_path / "scene.npy")
+    np.save(path, image)
+    return MemmapScene(path)
+
+
+def test_clamped_at_every_edge(scene):
+    viewport = ViewportEmulator(scene, 100, 50)
+    for x, y, expected in [(-40, -10, (0, 0)), (500, 20, (200, 20)), (30, 900, (30, 150)), (1e6, -1e6, (200, 0))]:
+        state = viewport.goto(x, y)
+        assert (state.x, state.y) == expected
+    viewport.goto(0, 0)
+    assert (viewport.pan(-5, 0).x, viewport.pan(0, -5).y) == (0, 0)
+
+
+def test_initial_state_clamped_lazily(scene):
+    viewport = ViewportEmulator(scene, 100, 50, x=1000, y=-3)
+    assert (viewport.position.x, viewport.position.y) == (1000, -3)
+    assert (viewport.state.x, viewport.state.y) == (200, 0)
+
+
+def test_zoom_limits_and_center(scene):
+    viewport = ViewportEmulator(scene, 100, 50, x=100, y=75, max_zoom=4.0)
+    state = viewport.zoom_by(2.0)
+    assert state.zoom == 2.0
+    # same center (150, 100), half the span
+    assert (state.x, state.y) == (125, 87.5)
+    assert viewport.zoom_by(100).zoom == 4.0
+    assert viewport.zoom_by(1e-6).zoom == viewport.min_zoom
+
+
+def test_zoomed_out_past_the_scene_is_centered(scene):
+    viewport = ViewportEmulator(scene, 100, 50)
+    state = viewport.goto(50, 50, zoom=0.25)
+    # span 400 x 200: wider than the scene, exactly as high
+    assert (state.x, state.y) == (-50, 0)
+    assert viewport.render().shape == (50, 100, 3)
+
+
+def test_zoom_then_pan_stays_inside(scene):
+    viewport = ViewportEmulator(scene, 100, 50, zoom=2.0)
+    viewport.goto(0, 0)
+    state = viewport.pan(10_000, 10_000)
+    assert (state.x, state.y) == (300 - 50, 200 - 25)
+    frame = viewport.render()
+    assert frame.shape == (50, 100, 3)
+    assert frame[0, 0, 0] == 250 and frame[0, 0, 1] == 175
+
+
+def test_render_at_zoom_one_is_a_view(scene):
+    viewport = ViewportEmulator(scene, 100, 50, x=20, y=10)
+    frame = viewport.render()
+    assert np.shares_memory(frame, scene.array)
+    assert (frame[0, 0, 0], frame[0, 0, 1]) == (20, 10)
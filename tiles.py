@@ -0,0 +1,124 @@
+"""
+Multi-resolution tile pyramid built once from a large scene image and cached on disk
+"""
+import json
+import math
+import os
+import threading
+
+import cv2
+
+TILE_SIZE = 256
+MANIFEST_NAME = "pyramid.json"
+
+
+class TilePyramid:
+    """
+    Tiles of a large image at zoom levels z = 0..max_zoom, like map tiles:
+    max_zoom is the full resolution, every level below halves the size, and
+    level 0 fits into a single tile. Tiles are files {cache_dir}/{z}/{x}_{y}{ext}.
+
+    The source is decoded once when the pyramid is built (or when the source
+    changes), afterwards tiles are served from disk as they were encoded.
+    The emulator renders from viewport.MemmapScene, not from the tiles.
+    """
+
+    def __init__(self, source_path, cache_dir=None, tile_size=TILE_SIZE, ext=".jpg", quality=95):
+        self.source_path = source_path
+        if cache_dir is None:
+            source_dir, source_name = os.path.split(source_path)
+            cache_dir = os.path.join(source_dir, ".tiles", os.path.splitext(source_name)[0])
+        self.cache_dir = cache_dir
+        self.tile_size = tile_size
+        self.ext = ext
+        self.quality = quality
+        self.manifest = None
+        self._build_lock = threading.Lock()
+
+    # ---- building -------------------------------------------------------
+
+    def ensure_built(self):
+        """Loads the manifest, building the pyramid first if it is missing or stale"""
+        if self.manifest is not None:
+            return self.manifest
+        with self._build_lock:
+            if self.manifest is None:
+                manifest = self._read_manifest()
+                if manifest is None or manifest != self._expected_manifest(manifest):
+                    manifest = self.build()
+                self.manifest = manifest
+        return self.manifest
+
+    def _source_id(self):
+        stat = os.stat(self.source_path)
+        return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+    def _expected_manifest(self, manifest):
+        expected = dict(manifest)
+        expected.update(self._source_id())
+        expected.update({"tile_size": self.tile_size, "ext": self.ext})
+        return expected
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST_NAME)) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def build(self):
+        image = cv2.imread(self.source_path)
+        if image is None:
+            raise FileNotFoundError(f"Cannot read scene image {self.source_path}")
+        height, width = image.shape[:2]
+        max_zoom = max(0, math.ceil(math.log2(max(width, height) / self.tile_size)))
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality] if self.ext == ".jpg" else []
+        for z in range(max_zoom, -1, -1):
+            level_dir = os.path.join(self.cache_dir, str(z))
+            os.makedirs(level_dir, exist_ok=True)
+            level_h, level_w = image.shape[:2]
+            for ty in range(math.ceil(level_h / self.tile_size)):
+                for tx in range(math.ceil(level_w / self.tile_size)):
+                    tile = image[ty * self.tile_size:(ty + 1) * self.tile_size,
+                                 tx * self.tile_size:(tx + 1) * self.tile_size]
+                    cv2.imwrite(os.path.join(level_dir, f"{tx}_{ty}{self.ext}"), tile, params)
+            if z:
+                image = cv2.resize(image, (max(1, (level_w + 1) // 2), max(1, (level_h + 1) // 2)),
+                                   interpolation=cv2.INTER_AREA)
+        manifest = {"width": width, "height": height, "max_zoom": max_zoom,
+                    "tile_size": self.tile_size, "ext": self.ext}
+        manifest.update(self._source_id())
+        with open(os.path.join(self.cache_dir, MANIFEST_NAME), "w") as file:
+            json.dump(manifest, file)
+        return manifest
+
+    # ---- reading --------------------------------------------------------
+
+    @property
+    def max_zoom(self):
+        return self.ensure_built()["max_zoom"]
+
+    def level_size(self, z):
+        """(width, height) of level z"""
+        manifest = self.ensure_built()
+        width, height = manifest["width"], manifest["height"]
+        for _ in range(manifest["max_zoom"] - z):
+            width, height = max(1, (width + 1) // 2), max(1, (height + 1) // 2)
+        return width, height
+
+    def tile_count(self, z):
+        width, height = self.level_size(z)
+        return math.ceil(width / self.tile_size), math.ceil(height / self.tile_size)
+
+    def tile_path(self, z, x, y):
+        if not 0 <= z <= self.max_zoom:
+            raise KeyError(f"No zoom level {z}")
+        columns, rows = self.tile_count(z)
+        if not (0 <= x < columns and 0 <= y < rows):
+            raise KeyError(f"No tile {x},{y} at zoom level {z}")
+        return os.path.join(self.cache_dir, str(z), f"{x}_{y}{self.ext}")
+
+    def tile_bytes(self, z, x, y):
+        """Encoded tile as stored on disk, for serving without a re-encode"""
+        with open(self.tile_path(z, x, y), "rb") as file:
+            return file.read()
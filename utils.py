@@ -1,6 +1,9 @@
 import numpy as np
 import cv2
 import socket
+from frame_store import FrameStore
+from viewport import MemmapScene, ViewportEmulator
+from overlay import OverlayRenderer
 
 def generate_osd_frame(frame,x, y, w, h,text):
     # Define the coordinates of the rectangle region (x, y, width, height)
@@ -43,58 +46,75 @@ def blur_outside_rectangle(frame, x, y, w, h):
 MOVE_DISTANCE = 20  # Number of pixels to move
 IMAGE_WIDTH = 640
 IMAGE_HEIGHT = 480
+SNAPSHOT_PATH = "app/static/image.jpg"
+SCENE_PATH = "test_data/big1.png"
 """
 Emulator class
 """
 class CameraController:
-    def __init__(self):
-        self.current_position = (1550, 1550)
-        self.large_image = cv2.imread("test_data/big1.png")
+    def __init__(self, store=None, scene=None):
+        # the scene is memory mapped, a move only changes the viewport and nothing
+        # is read or rendered until a consumer asks for the frame
+        self.scene = scene if scene is not None else MemmapScene(SCENE_PATH)
+        self.viewport = ViewportEmulator(self.scene, IMAGE_WIDTH, IMAGE_HEIGHT, 1550, 1550)
+        self.renderer = OverlayRenderer()
+        # without a shared store keep the old behaviour of writing the file
+        self.store = store if store is not None else FrameStore(snapshot_path=SNAPSHOT_PATH)
+
+    @property
+    def current_position(self):
+        state = self.viewport.position
+        return (int(round(state.x)), int(round(state.y)))
 
     # Function to move the camera to the left
     def move_left(self):
-        new_position = (self.current_position[0] - MOVE_DISTANCE, self.current_position[1])
-        if (new_position[0] > 3200 or new_position[1] > 3200): new_position = (1550, 1550)
-        new_image = self.large_image[self.current_position[1]:self.current_position[1] + IMAGE_HEIGHT, new_position[0]:new_position[0] + IMAGE_WIDTH]
-        self.current_position = new_position
-        self.save_image(new_image, "app/static/image.jpg")
-        return new_image
+        return self.move_by(-1, 0)
 
     # Function to move the camera to the right
     def move_right(self):
-        new_position = (self.current_position[0] + MOVE_DISTANCE, self.current_position[1])
-        if (new_position[0] > 4600 or new_position[1] > 3200 or new_position[0]<0 or new_position[1]<0): new_position = (1550, 1550)
-        new_image = self.large_image[self.current_position[1]:self.current_position[1] + IMAGE_HEIGHT, new_position[0]:new_position[0] + IMAGE_WIDTH]
-        self.current_position = new_position
-        self.save_image(new_image, "app/static/image.jpg")
-        return new_image
+        return self.move_by(1, 0)
 
     # Function to move the camera up
     def move_up(self):
-        new_position = (self.current_position[0], self.current_position[1] - MOVE_DISTANCE)
-        if (new_position[0] > 4600 or new_position[1] > 3200 or new_position[0]<0 or new_position[1]<0): new_position = (1550, 1550)
-        print(new_position)
-        new_image = self.large_image[new_position[1]:new_position[1] + IMAGE_HEIGHT, self.current_position[0]:self.current_position[0] + IMAGE_WIDTH]
-        self.current_position = new_position
-        self.save_image(new_image, "app/static/image.jpg")
-        return new_image
+        return self.move_by(0, -1)
 
     # Function to move the camera down
     def move_down(self):
-        new_position = (self.current_position[0], self.current_position[1] + MOVE_DISTANCE)
-        if (new_position[0] > 4600 or new_position[1] > 3200 or new_position[0]<0 or new_position[1]<0): new_position = (1550, 1550)
-        new_image = self.large_image[self.current_position[1]:self.current_position[1] + IMAGE_HEIGHT, new_position[0]:new_position[0] + IMAGE_WIDTH]
-        self.current_position = new_position
-        self.save_image(new_image, "app/static/image.jpg")
-        return new_image
+        return self.move_by(0, 1)
+
+    # Function to move the camera by dx, dy steps of MOVE_DISTANCE, the position is clamped to the scene
+    def move_by(self, dx, dy):
+        state = self.viewport.pan(dx * MOVE_DISTANCE, dy * MOVE_DISTANCE)
+        self.publish(state)
+        return state
+
+    # Function to move the camera to an absolute position (top-left, scene pixels, may be fractional)
+    def goto(self, x, y, zoom=None):
+        state = self.viewport.goto(x, y, zoom)
+        self.publish(state)
+        return state
+
+    def zoom_by(self, factor):
+        state = self.viewport.zoom_by(factor)
+        self.publish(state)
+        return state
+
+    # Function to publish the frame for state, rendered when a consumer reads it
+    def publish(self, state):
+        self.store.publish(render=lambda: self.render(state))
+        print(self.current_position)
 
+    def render(self, state=None):
+        x, y, w, h = 100, 100, 400, 300
+        return self.renderer.render(self.viewport.render(state), x, y, w, h, "")
 
-    # Function to save an image to a file
-    def save_image(self, image, file_path):
+    # Function to render a frame and publish it to the frame store
+    def save_image(self, image, file_path=None):
         x, y, w, h = 100, 100, 400, 300
-        image = blur_outside_rectangle(image, x, y, w, h)
-        image = generate_osd_frame(image, x, y, w, h, "")
-        cv2.imwrite(file_path, image)
+        image = self.renderer.render(image, x, y, w, h, "")
+        self.store.publish(image)
+        if file_path is not None:
+            cv2.imwrite(file_path, image)
         print(self.current_position)
 
 def real_cam_move_up():
@@ -112,6 +132,10 @@ def real_cam_move_right():
 def real_cam_move_home():
     pass
 
+def real_cam_move_by(camera, dx, dy):
+    # one relative move of camera's rig for the net displacement, in steps of MOVE_DISTANCE
+    pass
+
 def get_ip():
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     s.settimeout(0)
@@ -0,0 +1,166 @@
+"""
+Viewport emulator: a moving, zooming camera over a memory-mapped scene image
+"""
+import math
+import os
+import threading
+
+import cv2
+import numpy as np
+
+
+class MemmapScene:
+    """
+    Scene image as a read-only numpy memmap, pixels are paged in only where a
+    viewport reads them, so many emulated cameras can share one scene larger than RAM.
+
+    A .npy path is mapped directly. Any other image is decoded once and cached
+    as {source_dir}/.scene/{name}.npy, rebuilt when the source is newer.
+    """
+
+    def __init__(self, source_path, cache_path=None):
+        self.source_path = source_path
+        if cache_path is None and not source_path.endswith(".npy"):
+            source_dir, source_name = os.path.split(source_path)
+            cache_path = os.path.join(source_dir, ".scene", os.path.splitext(source_name)[0] + ".npy")
+        self.cache_path = cache_path
+        self._array = None
+        self._lock = threading.Lock()
+
+    @property
+    def array(self):
+        if self._array is None:
+            with self._lock:
+                if self._array is None:
+                    self._array = self._open()
+        return self._array
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    def _open(self):
+        if self.cache_path is None:
+            return np.load(self.source_path, mmap_mode="r")
+        try:
+            stale = os.stat(self.cache_path).st_mtime_ns < os.stat(self.source_path).st_mtime_ns
+        except FileNotFoundError:
+            stale = True
+        if stale:
+            image = cv2.imread(self.source_path)
+            if image is None:
+                raise FileNotFoundError(f"Cannot read scene image {self.source_path}")
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp.npy"
+            np.save(tmp_path, image)
+            os.replace(tmp_path, self.cache_path)
+        return np.load(self.cache_path, mmap_mode="r")
+
+
+class ViewportState:
+    """Immutable viewport: top-left (x, y) in scene pixels, may be fractional, and zoom"""
+    __slots__ = ("x", "y", "zoom")
+
+    def __init__(self, x, y, zoom):
+        self.x = x
+        self.y = y
+        self.zoom = zoom
+
+    def __repr__(self):
+        return f"ViewportState(x={self.x:.2f}, y={self.y:.2f}, zoom={self.zoom:.3f})"
+
+
+class ViewportEmulator:
+    """
+    width x height camera looking at a MemmapScene.
+
+    pan()/zoom_by()/goto() only change the state, nothing is read until
+    render() is called. At zoom 1 and a whole-pixel position render() returns
+    a view of the memmap without copying, otherwise it resamples only the
+    window under the viewport (sub-pixel pan, zoom > 1 zooms in).
+    The viewport is clamped to the scene the same way for every direction.
+    """
+
+    def __init__(self, scene, width, height, x=0.0, y=0.0, zoom=1.0, min_zoom=0.05, max_zoom=16.0):
+        self.scene = scene
+        self.width = width
+        self.height = height
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self._lock = threading.Lock()
+        self._state = ViewportState(float(x), float(y), float(zoom))
+        self._clamped = False
+
+    @property
+    def position(self):
+        """Last state set, without opening the scene to clamp it"""
+        return self._state
+
+    @property
+    def state(self):
+        """Current ViewportState, clamped to the scene"""
+        if not self._clamped:
+            with self._lock:
+                self._state = self._clamp(self._state.x, self._state.y, self._state.zoom)
+                self._clamped = True
+        return self._state
+
+    def _clamp(self, x, y, zoom):
+        scene_h, scene_w = self.scene.shape[:2]
+        zoom = min(max(zoom, self.min_zoom), self.max_zoom)
+        span_w, span_h = self.width / zoom, self.height / zoom
+        # a viewport larger than the scene is centered on it
+        x = min(max(x, 0.0), scene_w - span_w) if span_w <= scene_w else (scene_w - span_w) / 2
+        y = min(max(y, 0.0), scene_h - span_h) if span_h <= scene_h else (scene_h - span_h) / 2
+        return ViewportState(x, y, zoom)
+
+    def goto(self, x, y, zoom=None):
+        with self._lock:
+            zoom = self._state.zoom if zoom is None else zoom
+            self._state = self._clamp(float(x), float(y), float(zoom))
+            self._clamped = True
+        return self._state
+
+    def pan(self, dx, dy):
+        """Move by dx, dy output pixels (scaled by the zoom to scene pixels)"""
+        state = self.state
+        return self.goto(state.x + dx / state.zoom, state.y + dy / state.zoom)
+
+    def zoom_by(self, factor):
+        """Zoom around the viewport center"""
+        state = self.state
+        zoom = min(max(state.zoom * factor, self.min_zoom), self.max_zoom)
+        center_x = state.x + self.width / state.zoom / 2
+        center_y = state.y + self.height / state.zoom / 2
+        return self.goto(center_x - self.width / zoom / 2, center_y - self.height / zoom / 2, zoom)
+
+    def view(self, state=None):
+        """Zero-copy view for zoom 1, position rounded to whole pixels"""
+        state = state or self.state
+        x, y = int(round(state.x)), int(round(state.y))
+        return self.scene.array[max(y, 0):y + self.height, max(x, 0):x + self.width]
+
+    def render(self, state=None):
+        """Frame of width x height for state (the current one by default)"""
+        state = state or self.state
+        if state.zoom == 1.0 and state.x.is_integer() and state.y.is_integer() and state.x >= 0 and state.y >= 0:
+            view = self.view(state)
+            if view.shape[:2] == (self.height, self.width):
+                return view
+        scene = self.scene.array
+        scene_h, scene_w = scene.shape[:2]
+        span_w, span_h = self.width / state.zoom, self.height / state.zoom
+        # window of the scene under the viewport, one extra pixel for interpolation
+        x0, y0 = max(int(math.floor(state.x)), 0), max(int(math.floor(state.y)), 0)
+        x1 = min(int(math.ceil(state.x + span_w)) + 1, scene_w)
+        y1 = min(int(math.ceil(state.y + span_h)) + 1, scene_h)
+        window = scene[y0:y1, x0:x1]
+        if state.zoom < 1.0 and state.x >= 0 and state.y >= 0:
+            # zoomed out: area averaging avoids aliasing, the sub-pixel offset is below one output pixel
+            window = scene[y0:min(y0 + int(round(span_h)), scene_h), x0:min(x0 + int(round(span_w)), scene_w)]
+            return cv2.resize(window, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        scale = 1.0 / state.zoom
+        matrix = np.float32([[scale, 0, state.x - x0], [0, scale, state.y - y0]])
+        return cv2.warpAffine(window, matrix, (self.width, self.height),
+                              flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=0)